@@ -1,15 +1,13 @@
 
-from fastapi import Depends, HTTPException, status
-from sqlalchemy.ext.asyncio import AsyncSession
-from app.core.database import get_db
+from fastapi import Depends, HTTPException, Request, status
+from arq.connections import ArqRedis
 import logging
 
 logger = logging.getLogger(__name__)
 
-async def get_database() -> AsyncSession:
-    """Get database session dependency"""
-    async for db in get_db():
-        yield db
+def get_queue(request: Request) -> ArqRedis:
+    """Get background job queue dependency"""
+    return request.app.state.queue
 
 def get_current_user():
     """Get current user dependency (placeholder for future auth)"""
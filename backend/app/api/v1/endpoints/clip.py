@@ -1,17 +1,27 @@
-from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, HTTPException, Depends, Header
+from fastapi.responses import RedirectResponse, Response, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
+from arq.connections import ArqRedis
+from cachetools import TTLCache
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 import os
+import uuid
 import logging
 
-from app.schemas.clip import ClipRequest, ClipResponse
+from app.schemas.clip import ClipBatchRequest, ClipBatchResponse, ClipRequest, ClipResponse, ClipStatusResponse
 from app.services.youtube import YouTubeService
 from app.services.video_processing import VideoProcessingService
 from app.services.file_manager import FileManagerService
-from app.api.deps import get_database
+from app.services.clip import ClipService
+from app.services.storage import StorageService
+from app.api.deps import get_queue
+from app.core.database import get_db
+from app.core.queue import FETCH_QUEUE, RENDER_QUEUE, enqueue_render
+from app.config import settings
 from app.core.exceptions import (
-    VideoDownloadException, 
-    VideoProcessingException, 
+    VideoDownloadException,
+    VideoProcessingException,
+    StorageException,
     InvalidURLException,
     InvalidTimeFormatException,
     create_http_exception
@@ -20,15 +30,65 @@ from app.core.exceptions import (
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
-@router.post("/", response_model=ClipResponse)
+# video_id -> local file path for recently requested videos, skips the DB lookup on hits
+_video_cache: TTLCache = TTLCache(maxsize=1024, ttl=300)
+
+async def _with_first_chunk(first_chunk: bytes, stream: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Yield an already-read first chunk, then the rest of the stream"""
+    try:
+        yield first_chunk
+        async for chunk in stream:
+            yield chunk
+    finally:
+        await stream.aclose()  # Stops ffmpeg when the client goes away
+
+def _parse_range(range_header: str, file_size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single "bytes=start-end" range into inclusive offsets.
+    Returns None for malformed or multi-range headers (serve the full file
+    instead) and raises ValueError when the range is not satisfiable.
+    """
+    unit, _, spec = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    
+    first, _, last = spec.strip().partition("-")
+    try:
+        if not first:
+            # Suffix range: the last N bytes
+            suffix = int(last)
+            start, end = max(0, file_size - suffix), file_size - 1
+        else:
+            start = int(first)
+            end = min(int(last), file_size - 1) if last else file_size - 1
+    except ValueError:
+        return None
+    
+    if start < 0 or start >= file_size or start > end:
+        raise ValueError(f"Range not satisfiable: {range_header}")
+    return start, end
+
+async def _cached_video_path(db: AsyncSession, video_id: str) -> Optional[str]:
+    """Path of the downloaded video if it is still on disk, in-process cache first"""
+    video_path = _video_cache.get(video_id)
+    if video_path is None:
+        video_record = await YouTubeService.get_video_record(db, video_id)
+        video_path = video_record.file_path if video_record else None
+    
+    if video_path is not None and await FileManagerService.stat_async(video_path) is None:
+        return None
+    return video_path
+
+@router.post("/", response_model=ClipResponse, status_code=202)
 async def create_clip(
     request: ClipRequest,
-    background_tasks: BackgroundTasks,
-    db: AsyncSession = Depends(get_database)
+    db: AsyncSession = Depends(get_db),
+    queue: ArqRedis = Depends(get_queue)
 ):
     """
-    Create a clip from a YouTube video.
-    Downloads the video if not already cached in the database.
+    Queue a clip from a YouTube video for rendering.
+    Videos not yet cached are downloaded by the worker before rendering.
+    Poll /status/{clip_id} until the clip is done.
     """
     try:
         # Extract YouTube video ID
@@ -36,46 +96,53 @@ async def create_clip(
         logger.info(f"Processing clip request for video ID: {video_id}")
         
         # Check if video is already downloaded
-        video_record = await YouTubeService.get_video_record(db, video_id)
-        video_path = None
-        
-        if not video_record:
-            logger.info(f"Video {video_id} not found in database, downloading...")
-            
-            # Download the video
-            video_path = await YouTubeService.download_video(video_id, request.url)
-            
-            # Get file size
-            file_size = FileManagerService.get_file_size(video_path)
-            
-            # Save to database
-            await YouTubeService.save_video_record(db, video_id, video_path, file_size)
-            logger.info(f"Video {video_id} downloaded and saved to database")
-        else:
-            video_path = video_record.file_path
-            if not os.path.exists(video_path):
-                logger.warning(f"Video file {video_path} missing, re-downloading...")
-                video_path = await YouTubeService.download_video(video_id, request.url)
-                file_size = FileManagerService.get_file_size(video_path)
-                video_record.file_path = video_path
-                video_record.file_size = file_size
-                await db.commit()
+        video_path = await _cached_video_path(db, video_id)
         
-        # Create the clip
-        clip_path, clip_id = await VideoProcessingService.create_clip(
-            video_path, 
-            request.start_time, 
-            request.end_time
-        )
+        clip_id = str(uuid.uuid4())
+        await ClipService.create_clip_record(db, clip_id, video_id, request.start_time, request.end_time)
+        await db.commit()  # The worker reads this row from its own session
         
-        # Get clip file size
-        clip_size = FileManagerService.get_file_size(clip_path)
+        try:
+            if video_path is None:
+                # The worker downloads first and queues the render itself, so the
+                # request doesn't wait on yt-dlp and downloads overlap with encodes
+                await queue.enqueue_job(
+                    "fetch_video",
+                    video_id,
+                    request.url,
+                    request.start_time,
+                    request.end_time,
+                    clip_id,
+                    request.frame_accurate,
+                    _job_id=f"fetch:{clip_id}",
+                    _queue_name=FETCH_QUEUE
+                )
+                logger.info(f"Clip {clip_id} queued for video {video_id} (download pending)")
+            else:
+                _video_cache[video_id] = video_path
+                await queue.enqueue_job(
+                    "render_clip",
+                    video_id,
+                    request.start_time,
+                    request.end_time,
+                    clip_id,
+                    request.frame_accurate,
+                    _job_id=clip_id,
+                    _queue_name=RENDER_QUEUE
+                )
+                logger.info(f"Clip {clip_id} queued for video {video_id}")
+        except Exception as e:
+            # The row is already committed; without a job it would stay pending forever
+            logger.error(f"Failed to queue clip {clip_id}: {str(e)}")
+            await ClipService.mark_failed(db, clip_id, "Failed to queue the clip")
+            await db.commit()
+            raise create_http_exception(503, "Clip queue unavailable", {"clip_id": clip_id})
         
         return ClipResponse(
-            message="Clip created successfully",
+            message="Clip queued for processing",
             video_id=video_id,
             clip_id=clip_id,
-            file_size=clip_size
+            status="pending"
         )
         
     except InvalidURLException as e:
@@ -86,31 +153,250 @@ async def create_clip(
         logger.error(f"Invalid time format: {str(e)}")
         raise create_http_exception(400, "Invalid time format", {"error": str(e)})
     
+    except HTTPException:
+        raise
+    
+    except Exception as e:
+        logger.error(f"Unexpected error processing clip request: {str(e)}")
+        raise create_http_exception(500, "Internal server error", {"error": "An unexpected error occurred"})
+
+@router.post("/batch", response_model=ClipBatchResponse, status_code=202)
+async def create_clips(
+    request: ClipBatchRequest,
+    db: AsyncSession = Depends(get_db),
+    queue: ArqRedis = Depends(get_queue)
+):
+    """
+    Queue several clips at once. Videos not yet cached are all downloaded by
+    one job with a single yt-dlp run, and clips of the same video are cut
+    together. Poll /status/{clip_id} for each clip.
+    """
+    try:
+        clips = []
+        for clip in request.clips:
+            video_id = YouTubeService.extract_video_id(clip.url)
+            clip_id = str(uuid.uuid4())
+            await ClipService.create_clip_record(db, clip_id, video_id, clip.start_time, clip.end_time)
+            clips.append((clip_id, video_id, clip))
+        
+        cold_videos: Dict[str, str] = {}
+        for _, video_id, clip in clips:
+            if video_id in cold_videos or video_id in _video_cache:
+                continue
+            video_path = await _cached_video_path(db, video_id)
+            if video_path is None:
+                cold_videos[video_id] = clip.url
+            else:
+                _video_cache[video_id] = video_path
+        await db.commit()  # The worker reads these rows from its own session
+        
+        try:
+            cold_clips = []
+            warm_clips: Dict[str, List[Tuple[str, float, float, bool]]] = {}
+            for clip_id, video_id, clip in clips:
+                if video_id in cold_videos:
+                    cold_clips.append((clip_id, video_id, clip.start_time, clip.end_time, clip.frame_accurate))
+                else:
+                    warm_clips.setdefault(video_id, []).append(
+                        (clip_id, clip.start_time, clip.end_time, clip.frame_accurate)
+                    )
+            
+            # Clips of the same cached video are cut together
+            for video_id, video_clips in warm_clips.items():
+                await enqueue_render(queue, video_id, video_clips)
+            
+            if cold_clips:
+                await queue.enqueue_job(
+                    "fetch_videos",
+                    cold_videos,
+                    cold_clips,
+                    _job_id=f"fetch:{cold_clips[0][0]}",
+                    _queue_name=FETCH_QUEUE
+                )
+        except Exception as e:
+            logger.error(f"Failed to queue clip batch: {str(e)}")
+            for clip_id, _, _ in clips:
+                await ClipService.mark_failed(db, clip_id, "Failed to queue the clip")
+            await db.commit()
+            raise create_http_exception(503, "Clip queue unavailable", {"clip_ids": [c[0] for c in clips]})
+        
+        logger.info(f"Queued {len(clips)} clips ({len(cold_videos)} videos to download)")
+        return ClipBatchResponse(
+            message="Clips queued for processing",
+            clips=[
+                ClipResponse(
+                    message="Clip queued for processing",
+                    video_id=video_id,
+                    clip_id=clip_id,
+                    status="pending"
+                )
+                for clip_id, video_id, _ in clips
+            ]
+        )
+    
+    except InvalidURLException as e:
+        logger.error(f"Invalid URL: {str(e)}")
+        raise create_http_exception(400, "Invalid YouTube URL", {"error": str(e)})
+    
+    except HTTPException:
+        raise
+    
+    except Exception as e:
+        logger.error(f"Unexpected error processing clip batch: {str(e)}")
+        raise create_http_exception(500, "Internal server error", {"error": "An unexpected error occurred"})
+
+@router.post("/stream")
+async def stream_clip(request: ClipRequest, db: AsyncSession = Depends(get_db)):
+    """
+    Cut a clip and stream it back as fragmented MP4 without storing it.
+    Downloads the video first if not already cached.
+    """
+    try:
+        video_id = YouTubeService.extract_video_id(request.url)
+        video_path = await YouTubeService.ensure_video_downloaded(db, video_id, request.url)
+        video_record = await YouTubeService.get_video_record(db, video_id, with_metadata=True)
+        video_metadata = video_record.video_metadata if video_record else None
+        # Rows saved before failed probes were left out hold [], re-probe those too
+        keyframes = (video_metadata or {}).get("keyframes") or None
+        
+        # Give the connection back now; get_db would only commit once the whole stream is sent
+        await db.commit()
+        await db.close()
+        
+    except InvalidURLException as e:
+        logger.error(f"Invalid URL: {str(e)}")
+        raise create_http_exception(400, "Invalid YouTube URL", {"url": request.url})
+    
     except VideoDownloadException as e:
         logger.error(f"Video download failed: {str(e)}")
         raise create_http_exception(500, "Failed to download video", {"error": str(e)})
     
+    except Exception as e:
+        logger.error(f"Unexpected error processing stream request: {str(e)}")
+        raise create_http_exception(500, "Internal server error", {"error": "An unexpected error occurred"})
+    
+    logger.info(f"Streaming clip of video {video_id} from {request.start_time}s to {request.end_time}s")
+    stream = VideoProcessingService.create_clip_stream(
+        video_path,
+        request.start_time,
+        request.end_time,
+        frame_accurate=request.frame_accurate,
+        keyframes=keyframes
+    )
+    
+    # Headers go out before the body, so read the first chunk here; ffmpeg
+    # failing to start then becomes an error response instead of an empty 200
+    try:
+        first_chunk = await stream.__anext__()
+    except StopAsyncIteration:
+        logger.error(f"FFmpeg produced no output streaming clip of video {video_id}")
+        raise create_http_exception(500, "Failed to process video", {"error": "No output produced"})
+    except InvalidTimeFormatException as e:
+        raise create_http_exception(400, "Invalid time format", {"error": str(e)})
     except VideoProcessingException as e:
-        logger.error(f"Video processing failed: {str(e)}")
         raise create_http_exception(500, "Failed to process video", {"error": str(e)})
     
-    except Exception as e:
-        logger.error(f"Unexpected error processing clip request: {str(e)}")
-        raise create_http_exception(500, "Internal server error", {"error": "An unexpected error occurred"})
+    return StreamingResponse(
+        _with_first_chunk(first_chunk, stream),
+        headers={"Content-Disposition": f'attachment; filename="clip_{video_id}.mp4"'},
+        media_type="video/mp4"
+    )
+
+@router.get("/status/{clip_id}", response_model=ClipStatusResponse)
+async def get_clip_status(clip_id: str, db: AsyncSession = Depends(get_db)):
+    """
+    Get the rendering status of a queued clip.
+    """
+    clip_record = await ClipService.get_clip_record(db, clip_id)
+    
+    if not clip_record:
+        logger.warning(f"Clip not found: {clip_id}")
+        raise create_http_exception(404, "Clip not found", {"clip_id": clip_id})
+    
+    download_url = None
+    if clip_record.status == "done" and StorageService.is_enabled():
+        try:
+            download_url = await StorageService.presigned_url(clip_id)
+        except StorageException as e:
+            logger.warning(f"Could not presign clip {clip_id}: {str(e)}")
+    
+    return ClipStatusResponse(
+        clip_id=clip_record.clip_id,
+        video_id=clip_record.video_id,
+        status=clip_record.status,
+        file_size=clip_record.file_size,
+        error=clip_record.error,
+        download_url=download_url
+    )
 
 @router.get("/download/{clip_id}")
-async def download_clip(clip_id: str):
+async def download_clip(
+    clip_id: str,
+    range_header: Optional[str] = Header(None, alias="Range"),
+    db: AsyncSession = Depends(get_db)
+):
     """
     Download a clipped video file by clip ID.
+    Redirects to object storage when configured, otherwise serves the local
+    file with support for single byte-range requests.
     """
-    clip_path = f"uploads/clip_{clip_id}.mp4"
+    if StorageService.is_enabled():
+        clip_record = await ClipService.get_clip_record(db, clip_id)
+        if not clip_record or clip_record.status != "done":
+            logger.warning(f"Clip not found: {clip_id}")
+            raise create_http_exception(404, "Clip not found", {"clip_id": clip_id})
+        
+        try:
+            return RedirectResponse(await StorageService.presigned_url(clip_id), status_code=307)
+        except StorageException as e:
+            raise create_http_exception(502, "Failed to create download URL", {"error": str(e)})
     
-    if not os.path.exists(clip_path):
+    filename = f"clip_{clip_id}.mp4"
+    clip_path = os.path.join(settings.uploads_dir, filename)
+    
+    clip_stat = await FileManagerService.stat_async(clip_path)
+    if clip_stat is None:
         logger.warning(f"Clip not found: {clip_id}")
         raise create_http_exception(404, "Clip not found", {"clip_id": clip_id})
     
-    return FileResponse(
-        path=clip_path,
-        filename=f"clip_{clip_id}.mp4",
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    
+    # Let nginx serve the file with sendfile when it sits in front of us
+    if settings.accel_redirect_prefix:
+        headers["X-Accel-Redirect"] = f"{settings.accel_redirect_prefix.rstrip('/')}/{filename}"
+        return Response(headers=headers, media_type="video/mp4")
+    
+    file_size = clip_stat.st_size
+    headers["Accept-Ranges"] = "bytes"
+    
+    byte_range = None
+    if range_header:
+        try:
+            byte_range = _parse_range(range_header, file_size)
+        except ValueError as e:
+            logger.warning(f"Rejected range for clip {clip_id}: {str(e)}")
+            raise create_http_exception(
+                416,
+                "Requested range not satisfiable",
+                {"clip_id": clip_id, "range": range_header},
+                headers={"Content-Range": f"bytes */{file_size}"}
+            )
+    
+    if byte_range is None:
+        headers["Content-Length"] = str(file_size)
+        return StreamingResponse(
+            FileManagerService.iter_file(clip_path),
+            headers=headers,
+            media_type="video/mp4"
+        )
+    
+    start, end = byte_range
+    length = end - start + 1
+    headers["Content-Length"] = str(length)
+    headers["Content-Range"] = f"bytes {start}-{end}/{file_size}"
+    return StreamingResponse(
+        FileManagerService.iter_file(clip_path, start=start, length=length),
+        status_code=206,
+        headers=headers,
         media_type="video/mp4"
     )
\ No newline at end of file
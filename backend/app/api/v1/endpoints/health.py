@@ -4,7 +4,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 import logging
 
-from app.api.deps import get_database
+from app.core.database import get_db
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -15,7 +15,7 @@ async def health_check():
     return {"status": "healthy", "service": "YouTube Clipper API"}
 
 @router.get("/db")
-async def health_check_db(db: AsyncSession = Depends(get_database)):
+async def health_check_db(db: AsyncSession = Depends(get_db)):
     """Database health check endpoint"""
     try:
         await db.execute(text("SELECT 1"))
@@ -1,20 +1,31 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
 from sqlalchemy import MetaData
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
 import logging
 
 from app.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Pool is per worker process, so size it against web_concurrency and max_connections
+if settings.db_null_pool:
+    pool_options = {"poolclass": NullPool}
+else:
+    pool_options = {
+        "poolclass": AsyncAdaptedQueuePool,
+        "pool_size": max(2, settings.db_pool_size),
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+    }
+
 # Create async engine
 engine = create_async_engine(
     settings.database_url,
     echo=settings.debug,
     pool_pre_ping=True,
-    pool_recycle=300,
-    pool_size=10,
-    max_overflow=20,
+    **pool_options
 )
 
 # Create async session factory
@@ -34,18 +45,26 @@ async def init_db():
         async with engine.begin() as conn:
             await conn.run_sync(Base.metadata.create_all)
         logger.info("Database initialized successfully")
+        
+        if settings.db_null_pool:
+            logger.info("Database pool disabled (NullPool)")
+        else:
+            per_worker = pool_options["pool_size"] + pool_options["max_overflow"]
+            logger.info(
+                f"Database pool: {per_worker} connections per worker x {settings.web_concurrency} workers "
+                f"= up to {per_worker * settings.web_concurrency} connections"
+            )
     except Exception as e:
         logger.error(f"Failed to initialize database: {e}")
         raise
 
 async def get_db():
-    """Dependency to get database session"""
+    """Dependency to get a database session, committed once when the request succeeds"""
     async with AsyncSessionLocal() as session:
         try:
             yield session
+            await session.commit()
         except Exception as e:
             await session.rollback()
             logger.error(f"Database session error: {e}")
             raise
-        finally:
-            await session.close()
@@ -16,6 +16,10 @@ class VideoProcessingException(YouTubeClipperException):
     """Exception raised when video processing fails"""
     pass
 
+class StorageException(YouTubeClipperException):
+    """Exception raised when object storage operations fail"""
+    pass
+
 class InvalidURLException(YouTubeClipperException):
     """Exception raised when YouTube URL is invalid"""
     pass
@@ -24,12 +28,18 @@ class InvalidTimeFormatException(YouTubeClipperException):
     """Exception raised when time format is invalid"""
     pass
 
-def create_http_exception(status_code: int, message: str, details: Optional[Dict[str, Any]] = None) -> HTTPException:
+def create_http_exception(
+    status_code: int,
+    message: str,
+    details: Optional[Dict[str, Any]] = None,
+    headers: Optional[Dict[str, str]] = None
+) -> HTTPException:
     """Create HTTP exception with consistent format"""
     return HTTPException(
         status_code=status_code,
         detail={
             "message": message,
             "details": details or {}
-        }
+        },
+        headers=headers
     )
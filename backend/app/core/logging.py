@@ -1,53 +1,45 @@
 import logging
-import logging.config
+import logging.handlers
+import queue
+import sys
 from pathlib import Path
 from app.config import settings
 
-def setup_logging():
-    """Setup application logging configuration"""
-    
+def setup_logging() -> logging.handlers.QueueListener:
+    """
+    Setup application logging configuration.
+    Loggers only enqueue records; the returned listener writes them to the
+    console and log file from a background thread and must be started.
+    """
+
     # Create logs directory
     log_dir = Path(settings.log_file).parent
     log_dir.mkdir(exist_ok=True)
-    
-    logging_config = {
-        "version": 1,
-        "disable_existing_loggers": False,
-        "formatters": {
-            "detailed": {
-                "format": "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-            },
-            "simple": {
-                "format": "%(levelname)s - %(message)s"
-            }
-        },
-        "handlers": {
-            "console": {
-                "class": "logging.StreamHandler",
-                "level": settings.log_level,
-                "formatter": "simple",
-                "stream": "ext://sys.stdout"
-            },
-            "file": {
-                "class": "logging.handlers.RotatingFileHandler",
-                "level": settings.log_level,
-                "formatter": "detailed",
-                "filename": settings.log_file,
-                "maxBytes": 10485760,  # 10MB
-                "backupCount": 5
-            }
-        },
-        "loggers": {
-            "app": {
-                "level": settings.log_level,
-                "handlers": ["console", "file"],
-                "propagate": False
-            }
-        },
-        "root": {
-            "level": settings.log_level,
-            "handlers": ["console", "file"]
-        }
-    }
-    
-    logging.config.dictConfig(logging_config)
+
+    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler.setLevel(settings.log_level)
+    console_handler.setFormatter(logging.Formatter("%(levelname)s - %(message)s"))
+
+    file_handler = logging.handlers.RotatingFileHandler(
+        settings.log_file,
+        maxBytes=10485760,  # 10MB
+        backupCount=5
+    )
+    file_handler.setLevel(settings.log_level)
+    file_handler.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+
+    # Request path only pays for a queue put; writes and rotation happen off the event loop
+    log_queue = queue.Queue(-1)
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+
+    for logger in (logging.getLogger(), logging.getLogger("app")):
+        logger.handlers = [queue_handler]
+        logger.setLevel(settings.log_level)
+    logging.getLogger("app").propagate = False
+
+    return logging.handlers.QueueListener(
+        log_queue,
+        console_handler,
+        file_handler,
+        respect_handler_level=True
+    )
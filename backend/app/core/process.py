@@ -0,0 +1,107 @@
+import asyncio
+import shutil
+import subprocess
+from typing import AsyncIterator, Optional, Tuple
+
+# Executables resolved on PATH once at import instead of on every launch
+FFMPEG = shutil.which("ffmpeg") or "ffmpeg"
+FFPROBE = shutil.which("ffprobe") or "ffprobe"
+YTDLP = shutil.which("yt-dlp") or "yt-dlp"
+
+# Trailing stderr kept for error reporting
+STDERR_TAIL_LINES = 200
+STDERR_TAIL_BYTES = 64 * 1024
+
+async def _drain(stream: asyncio.StreamReader, tail: bytearray) -> None:
+    """
+    Read a stream in chunks until EOF, keeping only the last STDERR_TAIL_BYTES.
+    Unlike readline() this can't fail on a line longer than the reader's limit.
+    """
+    while True:
+        chunk = await stream.read(STDERR_TAIL_BYTES)
+        if not chunk:
+            break
+        tail += chunk
+        if len(tail) > STDERR_TAIL_BYTES:
+            del tail[:-STDERR_TAIL_BYTES]
+
+def _tail_text(tail: bytearray) -> str:
+    """Last STDERR_TAIL_LINES lines of the kept stderr"""
+    lines = tail.decode('utf-8', errors='replace').splitlines(keepends=True)
+    return "".join(lines[-STDERR_TAIL_LINES:])
+
+async def run_process(
+    *cmd: str,
+    capture_stdout: bool = False,
+    input: Optional[bytes] = None
+) -> Tuple[int, bytes, str]:
+    """
+    Run a command and return (returncode, stdout, last lines of stderr).
+    stderr is drained in the background so a chatty process never blocks on a
+    full pipe, and memory stays bounded. stdout is discarded unless captured;
+    input, if given, is written to stdin.
+    """
+    process = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdin=asyncio.subprocess.PIPE if input is not None else asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE if capture_stdout else asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE
+    )
+
+    tail = bytearray()
+    drain_task = asyncio.create_task(_drain(process.stderr, tail))
+    try:
+        if input is not None:
+            process.stdin.write(input)
+            await process.stdin.drain()
+            process.stdin.close()
+        stdout = await process.stdout.read() if capture_stdout else b""
+        await process.wait()
+        await drain_task
+    except BaseException:
+        # Cancelled (e.g. job timeout): don't leave the child running. Keep draining
+        # until it's gone, wait() only returns once its pipes reach EOF
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+        drain_task.cancel()
+        raise
+
+    return process.returncode, stdout, _tail_text(tail)
+
+async def stream_process(*cmd: str, chunk_size: int = 64 * 1024) -> AsyncIterator[bytes]:
+    """
+    Run a command and yield its stdout in chunks as it is produced.
+    stderr is drained like in run_process. Raises CalledProcessError (with the
+    stderr tail) on a non-zero exit; closing the generator early kills the process.
+    """
+    process = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+
+    tail = bytearray()
+    drain_task = asyncio.create_task(_drain(process.stderr, tail))
+    try:
+        while True:
+            chunk = await process.stdout.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+        await process.wait()
+        await drain_task
+    finally:
+        # Client disconnected or cancelled mid-stream
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+        drain_task.cancel()
+
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(
+            process.returncode,
+            cmd,
+            stderr=_tail_text(tail)
+        )
@@ -0,0 +1,53 @@
+from arq import create_pool
+from arq.connections import ArqRedis, RedisSettings
+from arq.constants import default_queue_name
+import logging
+from typing import List, Tuple
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+redis_settings = RedisSettings.from_dsn(settings.redis_url)
+
+# Downloads and renders run on separate queues so each has its own worker slots
+# and jobs waiting on one stage can't hold slots the other needs
+RENDER_QUEUE = default_queue_name
+FETCH_QUEUE = "arq:queue:fetch"
+
+async def create_queue() -> ArqRedis:
+    """Create the Redis connection pool used to enqueue background jobs"""
+    try:
+        pool = await create_pool(redis_settings)
+        logger.info("Job queue connected")
+        return pool
+    except Exception as e:
+        logger.error(f"Failed to connect to job queue: {e}")
+        raise
+
+async def enqueue_render(queue: ArqRedis, video_id: str, clips: List[Tuple[str, float, float, bool]]) -> None:
+    """
+    Queue (clip_id, start_time, end_time, frame_accurate) clips of one video for
+    rendering: one clip as render_clip, several as a render_clips job that cuts
+    them in a single ffmpeg run
+    """
+    if len(clips) == 1:
+        clip_id, start_time, end_time, frame_accurate = clips[0]
+        await queue.enqueue_job(
+            "render_clip",
+            video_id,
+            start_time,
+            end_time,
+            clip_id,
+            frame_accurate,
+            _job_id=clip_id,
+            _queue_name=RENDER_QUEUE
+        )
+    else:
+        await queue.enqueue_job(
+            "render_clips",
+            video_id,
+            clips,
+            _job_id=f"render:{clips[0][0]}",
+            _queue_name=RENDER_QUEUE
+        )
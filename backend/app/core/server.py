@@ -0,0 +1,17 @@
+from uvicorn.workers import UvicornWorker
+
+from app.config import settings
+
+class ServerWorker(UvicornWorker):
+    """
+    Gunicorn worker running the app on uvloop and httptools, with a per-worker
+    connection cap (uvicorn answers 503 beyond it). Gunicorn's own
+    --worker-connections only applies to gevent/eventlet workers.
+    """
+    CONFIG_KWARGS = {
+        **UvicornWorker.CONFIG_KWARGS,
+        # Fail loudly instead of silently falling back to asyncio/h11
+        "loop": "uvloop",
+        "http": "httptools",
+        "limit_concurrency": settings.web_worker_connections,
+    }
@@ -0,0 +1,35 @@
+from urllib.parse import urlparse, parse_qs
+import re
+from typing import Optional
+
+_YOUTUBE_HOSTS = {
+    'youtube.com',
+    'www.youtube.com',
+    'm.youtube.com',
+    'youtu.be',
+    'youtube-nocookie.com',
+    'www.youtube-nocookie.com',
+}
+_YOUTUBE_PATH_PREFIXES = ('/embed/', '/v/', '/shorts/', '/live/')
+_VIDEO_ID_RE = re.compile(r'^[0-9A-Za-z_-]{11}$')
+
+def parse_youtube_video_id(url: str) -> Optional[str]:
+    """Extract the video ID from a YouTube URL without backtracking regexes"""
+    parsed = urlparse(url if '://' in url else f'https://{url}')
+    host = (parsed.hostname or '').lower()
+    if host not in _YOUTUBE_HOSTS:
+        return None
+    
+    path = parsed.path
+    if host == 'youtu.be':
+        candidate = path[1:]
+    elif path == '/watch':
+        candidate = parse_qs(parsed.query).get('v', [''])[0]
+    else:
+        prefix = next((p for p in _YOUTUBE_PATH_PREFIXES if path.startswith(p)), None)
+        if prefix is None:
+            return None
+        candidate = path[len(prefix):]
+    
+    candidate = candidate.split('/', 1)[0]
+    return candidate if _VIDEO_ID_RE.match(candidate) else None
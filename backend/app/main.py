@@ -2,21 +2,36 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from pathlib import Path
+import asyncio
 import logging
 
 from app.core.database import init_db
+from app.core.queue import create_queue
 from app.core.logging import setup_logging
 from app.api.v1.router import api_router
+from app.services.file_manager import FileManagerService
 from app.config import settings
 
 # Setup logging
-setup_logging()
+log_listener = setup_logging()
 logger = logging.getLogger(__name__)
 
+async def sweep_expired_clips():
+    """Periodically delete local clips older than the configured TTL"""
+    while True:
+        await asyncio.sleep(settings.clip_sweep_interval)
+        try:
+            removed = await FileManagerService.sweep_expired_clips(settings.uploads_dir, settings.clip_ttl)
+            if removed:
+                logger.info(f"Removed {removed} expired clips")
+        except Exception as e:
+            logger.error(f"Clip sweep failed: {e}")
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan events"""
     # Startup
+    log_listener.start()
     logger.info("Starting up YouTube Clipper API...")
     await init_db()
     
@@ -25,10 +40,19 @@ async def lifespan(app: FastAPI):
     uploads_dir.mkdir(exist_ok=True)
     logger.info(f"Uploads directory ready: {uploads_dir}")
     
+    # Connect to the background job queue
+    app.state.queue = await create_queue()
+    
+    # One sweep task expires clips, including ones left behind by crashed workers
+    app.state.sweep_task = asyncio.create_task(sweep_expired_clips())
+    
     yield
     
     # Shutdown
     logger.info("Shutting down YouTube Clipper API...")
+    app.state.sweep_task.cancel()
+    await app.state.queue.aclose()
+    log_listener.stop()
 
 def create_app() -> FastAPI:
     """Create and configure FastAPI application"""
@@ -0,0 +1,21 @@
+from sqlalchemy import Column, String, DateTime, Text, Integer, Float
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+class Clip(Base):
+    """Model for tracking clip rendering jobs"""
+    __tablename__ = "clips"
+
+    clip_id = Column(String(36), primary_key=True, index=True)
+    video_id = Column(String(20), nullable=False, index=True)
+    start_time = Column(Float, nullable=False)  # Seconds
+    end_time = Column(Float, nullable=False)
+    status = Column(String(16), nullable=False, default="pending", index=True)  # pending | done | failed
+    file_path = Column(Text, nullable=True)  # Local path, or object key when stored in S3
+    file_size = Column(Integer, nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    completed_at = Column(DateTime(timezone=True), nullable=True)
+
+    def __repr__(self):
+        return f"<Clip(clip_id='{self.clip_id}', video_id='{self.video_id}', status='{self.status}')>"
\ No newline at end of file
@@ -1,4 +1,5 @@
 from sqlalchemy import Column, String, DateTime, Boolean, Text, Integer
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.sql import func
 from app.core.database import Base
 
@@ -10,6 +11,9 @@ class VideoDownload(Base):
     file_path = Column(Text, nullable=False)
     file_size = Column(Integer, nullable=True)
     duration = Column(Integer, nullable=True)  # Duration in seconds
+    # Probed once at download: duration, codec, dimensions and keyframe timestamps.
+    # "metadata" is reserved on declarative models, hence the attribute name.
+    video_metadata = Column("metadata", JSONB, nullable=True)
     downloaded_at = Column(DateTime(timezone=True), server_default=func.now())
     is_active = Column(Boolean, default=True, index=True)
     
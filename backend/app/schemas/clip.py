@@ -1,40 +1,95 @@
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, BeforeValidator, ConfigDict, Field, WithJsonSchema, field_validator, model_validator
 import re
-from typing import Optional
+from typing import Annotated, List, Optional
+
+from app.config import settings
+from app.core.youtube_url import parse_youtube_video_id
+
+_TIME_RE = re.compile(r'^(?:(\d{1,2}):)?(\d{1,2}):(\d{2}(?:\.\d+)?)$')
+
+def _parse_time(value: str) -> float:
+    """Parse HH:MM:SS(.mmm) or MM:SS(.mmm) into seconds"""
+    if not isinstance(value, str):
+        raise ValueError('Time must be a string in format HH:MM:SS or MM:SS')
+    match = _TIME_RE.match(value)
+    if not match:
+        raise ValueError('Time must be in format HH:MM:SS, MM:SS, or include milliseconds')
+    
+    hours, minutes, seconds = match.groups()
+    seconds = float(seconds)
+    minutes = int(minutes)
+    if seconds >= 60 or (hours is not None and minutes >= 60):
+        raise ValueError('Minutes and seconds must be below 60')
+    
+    return int(hours or 0) * 3600 + minutes * 60 + seconds
+
+# Sent as a time string, validated and stored as seconds; documented as the string clients send
+ClipTime = Annotated[
+    float,
+    BeforeValidator(_parse_time),
+    WithJsonSchema({
+        "type": "string",
+        "pattern": _TIME_RE.pattern,
+        "examples": ["01:30", "00:01:30.500"]
+    })
+]
 
 class ClipRequest(BaseModel):
     """Schema for clip creation request"""
+    model_config = ConfigDict(frozen=True, extra='forbid')
+    
     url: str = Field(..., description="YouTube video URL")
-    start_time: str = Field(..., description="Start time in format HH:MM:SS or MM:SS")
-    end_time: str = Field(..., description="End time in format HH:MM:SS or MM:SS")
+    start_time: ClipTime = Field(..., description="Start time in format HH:MM:SS or MM:SS, parsed to seconds")
+    end_time: ClipTime = Field(..., description="End time in format HH:MM:SS or MM:SS, parsed to seconds")
+    frame_accurate: bool = Field(False, description="Re-encode for exact cut points instead of snapping to keyframes")
     
-    @validator('url')
-    def validate_youtube_url(cls, v):
+    @field_validator('url')
+    @classmethod
+    def validate_youtube_url(cls, v: str) -> str:
         """Validate YouTube URL format"""
-        youtube_regex = re.compile(
-            r'(https?://)?(www\.)?(youtube|youtu|youtube-nocookie)\.(com|be)/'
-            r'(watch\?v=|embed/|v/|.+\?v=)?([^&=%\?]{11})'
-        )
-        if not youtube_regex.match(v):
+        if not parse_youtube_video_id(v):
             raise ValueError('Invalid YouTube URL format')
         return v
     
-    @validator('start_time', 'end_time')
-    def validate_time_format(cls, v):
-        """Validate time format"""
-        time_regex = re.compile(r'^(\d{1,2}:)?(\d{1,2}):(\d{2})(\.\d+)?$')
-        if not time_regex.match(v):
-            raise ValueError('Time must be in format HH:MM:SS, MM:SS, or include milliseconds')
-        return v
+    @model_validator(mode='after')
+    def validate_time_range(self) -> 'ClipRequest':
+        """Validate that the clip range is non-empty and within the duration limit"""
+        duration = self.end_time - self.start_time
+        if duration <= 0:
+            raise ValueError('End time must be after start time')
+        if duration > settings.max_video_duration:
+            raise ValueError(f'Clip duration cannot exceed {settings.max_video_duration} seconds')
+        return self
 
 class ClipResponse(BaseModel):
     """Schema for clip creation response"""
     message: str
     video_id: str
     clip_id: str
+    status: Optional[str] = None
     duration: Optional[float] = None
     file_size: Optional[int] = None
 
+class ClipBatchRequest(BaseModel):
+    """Schema for queueing several clips at once"""
+    model_config = ConfigDict(frozen=True, extra='forbid')
+    
+    clips: List[ClipRequest] = Field(..., min_length=1, max_length=settings.max_batch_clips)
+
+class ClipBatchResponse(BaseModel):
+    """Schema for batch clip creation response"""
+    message: str
+    clips: List[ClipResponse]
+
+class ClipStatusResponse(BaseModel):
+    """Schema for clip job status"""
+    clip_id: str
+    video_id: str
+    status: str = Field(..., description="One of pending, done or failed")
+    file_size: Optional[int] = None
+    download_url: Optional[str] = Field(None, description="Pre-signed URL when clips are kept in object storage")
+    error: Optional[str] = None
+
 class ClipDownloadResponse(BaseModel):
     """Schema for clip download information"""
     video_id: str
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from datetime import datetime
 from typing import Optional
 
@@ -15,8 +15,7 @@ class VideoCreate(VideoBase):
 
 class VideoResponse(VideoBase):
     """Schema for video response"""
+    model_config = ConfigDict(from_attributes=True)
+    
     downloaded_at: datetime
     is_active: bool
-    
-    class Config:
-        from_attributes = True
@@ -0,0 +1,69 @@
+from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from sqlalchemy.sql import func
+import logging
+
+from app.models.clip import Clip
+
+logger = logging.getLogger(__name__)
+
+class ClipService:
+    """Service for clip job bookkeeping"""
+
+    @staticmethod
+    async def create_clip_record(db: AsyncSession, clip_id: str, video_id: str, start_time: float, end_time: float) -> Clip:
+        """Save a pending clip record to database"""
+        try:
+            clip_record = Clip(
+                clip_id=clip_id,
+                video_id=video_id,
+                start_time=start_time,
+                end_time=end_time,
+                status="pending"
+            )
+            db.add(clip_record)
+            await db.flush()
+            logger.info(f"Clip record saved: {clip_id}")
+            return clip_record
+        except Exception as e:
+            await db.rollback()
+            logger.error(f"Error saving clip record: {e}")
+            raise
+
+    @staticmethod
+    async def get_clip_record(db: AsyncSession, clip_id: str) -> Optional[Clip]:
+        """Get clip record from database"""
+        try:
+            result = await db.execute(select(Clip).where(Clip.clip_id == clip_id))
+            return result.scalar_one_or_none()
+        except Exception as e:
+            logger.error(f"Error fetching clip record: {e}")
+            return None
+
+    @staticmethod
+    async def mark_done(db: AsyncSession, clip_id: str, file_path: str, file_size: int = None) -> None:
+        """Mark a clip as successfully rendered"""
+        clip_record = await ClipService.get_clip_record(db, clip_id)
+        if not clip_record:
+            logger.warning(f"Clip record {clip_id} not found while marking done")
+            return
+
+        clip_record.status = "done"
+        clip_record.file_path = file_path
+        clip_record.file_size = file_size
+        clip_record.completed_at = func.now()
+        await db.flush()
+
+    @staticmethod
+    async def mark_failed(db: AsyncSession, clip_id: str, error: str) -> None:
+        """Mark a clip as failed with the given error message"""
+        clip_record = await ClipService.get_clip_record(db, clip_id)
+        if not clip_record:
+            logger.warning(f"Clip record {clip_id} not found while marking failed")
+            return
+
+        clip_record.status = "failed"
+        clip_record.error = error
+        clip_record.completed_at = func.now()
+        await db.flush()
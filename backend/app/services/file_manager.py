@@ -1,6 +1,10 @@
 import os
+import time
 from pathlib import Path
+from typing import AsyncIterator, Optional
 import logging
+import aiofiles
+import aiofiles.os
 
 logger = logging.getLogger(__name__)
 
@@ -8,16 +12,71 @@ class FileManagerService:
     """Service for file management operations"""
     
     @staticmethod
-    def get_file_size(file_path: str) -> int:
-        """Get file size in bytes"""
+    async def stat_async(file_path: str) -> Optional[os.stat_result]:
+        """Stat a file without blocking the event loop; None if it doesn't exist"""
         try:
-            return os.path.getsize(file_path)
+            return await aiofiles.os.stat(file_path)
+        except FileNotFoundError:
+            return None
+    
+    @staticmethod
+    async def get_file_size(file_path: str) -> int:
+        """Get file size in bytes without blocking the event loop"""
+        try:
+            stat_result = await aiofiles.os.stat(file_path)
+            return stat_result.st_size
         except OSError:
             return 0
     
+    @staticmethod
+    async def cleanup_file(file_path: str) -> bool:
+        """Delete a file without blocking the event loop; returns whether it was removed"""
+        try:
+            await aiofiles.os.remove(file_path)
+            logger.debug(f"Removed file: {file_path}")
+            return True
+        except FileNotFoundError:
+            return False
+        except OSError as e:
+            logger.warning(f"Failed to remove {file_path}: {e}")
+            return False
+    
+    @staticmethod
+    async def sweep_expired_clips(directory: str, max_age: int) -> int:
+        """Delete clip files older than max_age seconds; returns how many were removed"""
+        now = time.time()
+        removed = 0
+        for path in Path(directory).glob("clip_*.mp4"):
+            stat_result = await FileManagerService.stat_async(str(path))
+            if stat_result and now - stat_result.st_mtime > max_age:
+                if await FileManagerService.cleanup_file(str(path)):
+                    removed += 1
+        return removed
+    
     @staticmethod
     def ensure_directory(directory: str) -> Path:
         """Ensure directory exists"""
         path = Path(directory)
         path.mkdir(parents=True, exist_ok=True)
         return path
+    
+    @staticmethod
+    async def iter_file(
+        file_path: str,
+        start: int = 0,
+        length: Optional[int] = None,
+        chunk_size: int = 1 << 20
+    ) -> AsyncIterator[bytes]:
+        """Stream a file (or a byte range of it) in chunks without blocking the event loop"""
+        async with aiofiles.open(file_path, "rb") as f:
+            if start:
+                await f.seek(start)
+            remaining = length
+            while remaining is None or remaining > 0:
+                size = chunk_size if remaining is None else min(chunk_size, remaining)
+                chunk = await f.read(size)
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
@@ -0,0 +1,69 @@
+import aioboto3
+import logging
+
+from app.core.exceptions import StorageException
+from app.services.file_manager import FileManagerService
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+_session = aioboto3.Session()
+
+class StorageService:
+    """Service for storing finished clips in S3-compatible object storage"""
+
+    @staticmethod
+    def is_enabled() -> bool:
+        """Object storage is used when a bucket is configured, local uploads/ otherwise"""
+        return bool(settings.s3_bucket)
+
+    @staticmethod
+    def clip_key(clip_id: str) -> str:
+        """Object key for a clip"""
+        return f"clips/{clip_id}.mp4"
+
+    @staticmethod
+    def _client():
+        return _session.client(
+            "s3",
+            region_name=settings.s3_region or None,
+            endpoint_url=settings.s3_endpoint_url or None
+        )
+
+    @staticmethod
+    async def upload_clip(clip_path: str, clip_id: str) -> str:
+        """Upload a rendered clip, remove the local copy and return its object key"""
+        key = StorageService.clip_key(clip_id)
+        try:
+            async with StorageService._client() as s3:
+                await s3.upload_file(
+                    clip_path,
+                    settings.s3_bucket,
+                    key,
+                    ExtraArgs={"ContentType": "video/mp4"}
+                )
+        except Exception as e:
+            logger.error(f"Failed to upload clip {clip_id}: {str(e)}")
+            raise StorageException(f"Failed to upload clip: {str(e)}")
+
+        await FileManagerService.cleanup_file(clip_path)
+        logger.info(f"Clip {clip_id} uploaded to {settings.s3_bucket}/{key}")
+        return key
+
+    @staticmethod
+    async def presigned_url(clip_id: str) -> str:
+        """Create a time-limited download URL for a stored clip"""
+        try:
+            async with StorageService._client() as s3:
+                return await s3.generate_presigned_url(
+                    "get_object",
+                    Params={
+                        "Bucket": settings.s3_bucket,
+                        "Key": StorageService.clip_key(clip_id),
+                        "ResponseContentDisposition": f'attachment; filename="clip_{clip_id}.mp4"'
+                    },
+                    ExpiresIn=settings.s3_presign_expiry
+                )
+        except Exception as e:
+            logger.error(f"Failed to presign clip {clip_id}: {str(e)}")
+            raise StorageException(f"Failed to create download URL: {str(e)}")
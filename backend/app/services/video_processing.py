@@ -1,28 +1,71 @@
 import asyncio
+import collections
 import subprocess
 import os
+import time
 import uuid
 from pathlib import Path
-from typing import Tuple
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 import logging
+import aiofiles
+import orjson
 from app.core.exceptions import VideoProcessingException, InvalidTimeFormatException
+from app.core.process import FFMPEG, FFPROBE, run_process, stream_process
+from app.services.file_manager import FileManagerService
 from app.config import settings
 
 logger = logging.getLogger(__name__)
 
+# How far around the requested range to look for keyframes (seconds)
+KEYFRAME_SEARCH_WINDOW = 10
+
+# Max distance from the requested start to the keyframe before it for stream copy (seconds);
+# further away the copied clip would visibly start early, so re-encode instead
+KEYFRAME_SNAP_TOLERANCE = 0.5
+
+# Hardware H.264 encoders in order of preference for "auto"
+HARDWARE_ENCODERS = ("h264_videotoolbox", "h264_nvenc", "h264_qsv", "h264_vaapi")
+
+_selected_encoder: Optional[str] = None
+
+# Bytes read from each end of a clip when checking for MP4 atoms
+MP4_SNIFF_BYTES = 64 * 1024
+
+# Caps simultaneous ffmpeg processes so parallel encodes don't time-slice the CPU
+# FFMPEG_THREADS=0 is ffmpeg's "auto"; count it as one thread per job when sizing
+_ENCODE_SEM = asyncio.Semaphore(
+    settings.ffmpeg_concurrency or max(1, (os.cpu_count() or 4) // max(1, settings.ffmpeg_threads))
+)
+
+# /clip/stream runs ffmpeg in every web worker process, so it gets a small limit of
+# its own rather than a full _ENCODE_SEM sized for the whole machine per process
+_STREAM_SEM = asyncio.Semaphore(max(1, settings.stream_concurrency))
+
+# LRU of ffprobe results keyed on (probe, path, size, mtime_ns), so a re-downloaded
+# file gets a new key instead of a stale entry
+PROBE_CACHE_SIZE = 128
+_probe_cache: "collections.OrderedDict[tuple, Any]" = collections.OrderedDict()
+
 class VideoProcessingService:
     """Service for video processing operations"""
     
     @staticmethod
-    async def create_clip(video_path: str, start_time: str, end_time: str) -> Tuple[str, str]:
-        """Create a clip from the video and return (clip_path, clip_id)"""
-        clip_id = str(uuid.uuid4())
+    async def create_clip(
+        video_path: str,
+        start_seconds: float,
+        end_seconds: float,
+        clip_id: Optional[str] = None,
+        frame_accurate: bool = False,
+        keyframes: Optional[List[float]] = None
+    ) -> Tuple[str, str]:
+        """
+        Create a clip from the video and return (clip_path, clip_id).
+        Pass the cached keyframe index to skip probing the source.
+        """
+        clip_id = clip_id or str(uuid.uuid4())
         output_path = Path(settings.uploads_dir) / f"clip_{clip_id}.mp4"
         
         try:
-            # Convert time format if needed
-            start_seconds = VideoProcessingService._time_to_seconds(start_time)
-            end_seconds = VideoProcessingService._time_to_seconds(end_time)
             duration = end_seconds - start_seconds
             
             if duration <= 0:
@@ -31,92 +74,53 @@ class VideoProcessingService:
             if duration > settings.max_video_duration:
                 raise InvalidTimeFormatException(f"Clip duration cannot exceed {settings.max_video_duration} seconds")
             
-            # Convert seconds back to HH:MM:SS format for FFmpeg
-            start_time_formatted = VideoProcessingService._seconds_to_time_format(start_seconds)
-            end_time_formatted = VideoProcessingService._seconds_to_time_format(end_seconds)
-            
-            # First try with stream copy but with better keyframe handling
-            cmd_copy = [
-                "ffmpeg",
-                "-ss", start_time_formatted,  # Seek before input for faster processing
-                "-i", video_path,
-                "-to", end_time_formatted,  # Use end time for accuracy
-                "-c", "copy",
-                "-avoid_negative_ts", "make_zero",
-                "-map_metadata", "-1",  # Remove metadata that might cause issues
-                "-y",
-                str(output_path)
-            ]
-            
-            logger.info(f"Creating clip {clip_id} from {start_time} to {end_time} using stream copy")
-            process = await asyncio.create_subprocess_exec(
-                *cmd_copy,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            
-            stdout, stderr = await process.communicate()
+            # Stream copy is only frame-accurate when the cut lands on keyframes, so
+            # widen the range outward to the surrounding keyframes when start is close
+            # to one; otherwise go straight to re-encoding
+            keyframe_bounds = None
+            if not frame_accurate:
+                if keyframes is None:
+                    keyframes = await VideoProcessingService._probe_keyframes(video_path, start_seconds, end_seconds) or []
+                keyframe_bounds = VideoProcessingService._keyframe_bounds(keyframes, start_seconds, end_seconds)
             
-            # Check if stream copy produced a valid file
-            stream_copy_success = (
-                process.returncode == 0 and 
-                output_path.exists() and 
-                output_path.stat().st_size > 1000  # At least 1KB
-            )
+            stream_copy_success = False
+            if keyframe_bounds:
+                kf_start, kf_end = keyframe_bounds
+                cmd_copy = VideoProcessingService._copy_command(
+                    video_path, kf_start, kf_end, VideoProcessingService._movflags(), ["-y", str(output_path)]
+                )
+                
+                logger.info(f"Creating clip {clip_id} from {kf_start:.3f}s to {kf_end:.3f}s using stream copy")
+                returncode, error_msg = await VideoProcessingService._run_ffmpeg(cmd_copy, clip_id)
+                
+                # Check if stream copy produced a valid file
+                output_stat = await FileManagerService.stat_async(str(output_path)) if returncode == 0 else None
+                stream_copy_success = output_stat is not None and output_stat.st_size > 1000  # At least 1KB
             
-            # If stream copy fails or produces small file, try re-encoding
+            # Re-encode when frame accuracy is required, the range spans too few
+            # keyframes, or stream copy produced an unusable file
             if not stream_copy_success:
-                logger.info(f"Stream copy failed for clip {clip_id}, trying re-encoding...")
+                logger.info(f"Stream copy not usable for clip {clip_id}, re-encoding...")
                 
                 # Remove failed file if exists
-                if output_path.exists():
-                    output_path.unlink()
+                await FileManagerService.cleanup_file(str(output_path))
                 
                 # Re-encoding with better compatibility settings
-                cmd_encode = [
-                    "ffmpeg",
-                    "-ss", start_time_formatted,
-                    "-i", video_path,
-                    "-to", end_time_formatted,  # Use end time for accuracy
-                    
-                    # Video encoding settings for maximum compatibility
-                    "-c:v", "libx264",
-                    "-preset", "medium",  # Better quality than 'fast'
-                    "-crf", "23",
-                    "-profile:v", "high",  # Better than baseline, widely supported
-                    "-level", "4.0",  # Modern standard level
-                    "-pix_fmt", "yuv420p",
-                    
-                    # Audio encoding
-                    "-c:a", "aac",
-                    "-b:a", "128k",
-                    "-ar", "44100",  # Standard sample rate
-                    
-                    # Container and compatibility options
-                    "-movflags", "+faststart",  # Web optimization
-                    "-avoid_negative_ts", "make_zero",
-                    "-map_metadata", "-1",  # Remove potentially problematic metadata
-                    "-fflags", "+genpts",  # Generate timestamps
-                    
-                    "-y",
-                    str(output_path)
-                ]
-                
-                logger.info(f"Re-encoding clip {clip_id}")
-                process = await asyncio.create_subprocess_exec(
-                    *cmd_encode,
-                    stdout=asyncio.subprocess.PIPE,
-                    stderr=asyncio.subprocess.PIPE
+                encoder = await VideoProcessingService.get_encoder()
+                cmd_encode = VideoProcessingService._encode_command(
+                    video_path, start_seconds, duration, encoder, VideoProcessingService._movflags(), ["-y", str(output_path)]
                 )
                 
-                stdout, stderr = await process.communicate()
+                logger.info(f"Re-encoding clip {clip_id} with {encoder}")
+                returncode, error_msg = await VideoProcessingService._run_ffmpeg(cmd_encode, clip_id)
             
-            if process.returncode != 0:
-                error_msg = stderr.decode('utf-8') if stderr else "Unknown error"
+            if returncode != 0:
+                error_msg = error_msg or "Unknown error"
                 logger.error(f"FFmpeg failed for clip {clip_id}: {error_msg}")
                 raise VideoProcessingException(f"Failed to create clip: {error_msg}")
             
-            if not output_path.exists() or output_path.stat().st_size == 0:
+            output_stat = await FileManagerService.stat_async(str(output_path))
+            if output_stat is None or output_stat.st_size == 0:
                 raise VideoProcessingException("Clip creation failed - output file is missing or empty")
             
             # Additional validation - try to get info about the created file
@@ -126,27 +130,428 @@ class VideoProcessingService:
                 logger.warning(f"Output validation failed for {clip_id}: {str(e)}")
                 # Don't fail here, just log the warning
             
-            logger.info(f"Clip created successfully: {output_path} (size: {output_path.stat().st_size} bytes)")
+            logger.info(f"Clip created successfully: {output_path} (size: {output_stat.st_size} bytes)")
             return str(output_path), clip_id
             
         except Exception as e:
             # Clean up failed clip file
-            if output_path.exists():
-                try:
-                    output_path.unlink()
-                except:
-                    pass
+            await FileManagerService.cleanup_file(str(output_path))
             
             logger.error(f"Error creating clip: {str(e)}")
             if isinstance(e, (InvalidTimeFormatException, VideoProcessingException)):
                 raise
             raise VideoProcessingException(f"Clip creation failed: {str(e)}")
     
+    @staticmethod
+    async def create_clips_batch(
+        video_path: str,
+        ranges: List[Tuple[str, float, float]],
+        keyframes: Optional[List[float]] = None
+    ) -> Dict[str, str]:
+        """
+        Stream-copy several (clip_id, start_seconds, end_seconds) ranges of one
+        video with a single ffmpeg run and return clip_id -> clip_path for the
+        outputs it produced. Each range is its own input, seeked before opening
+        as in _copy_command, and mapped to its own output. Ranges that can't be
+        stream copied or that the run didn't produce are left to create_clip.
+        """
+        if keyframes is None:
+            keyframes = await VideoProcessingService._probe_keyframes(video_path) or []
+        
+        copyable = []
+        for clip_id, start_seconds, end_seconds in ranges:
+            if not 0 < end_seconds - start_seconds <= settings.max_video_duration:
+                continue  # create_clip reports the error
+            keyframe_bounds = VideoProcessingService._keyframe_bounds(keyframes, start_seconds, end_seconds)
+            if keyframe_bounds:
+                output_path = str(Path(settings.uploads_dir) / f"clip_{clip_id}.mp4")
+                copyable.append((clip_id, *keyframe_bounds, output_path))
+        
+        if len(copyable) < 2:
+            return {}  # Nothing to share, create_clip does the same in one run
+        
+        cmd = [FFMPEG, "-hide_banner", "-nostats", "-loglevel", "error"]
+        for _, kf_start, kf_end, _ in copyable:
+            cmd += ["-ss", f"{kf_start:.6f}", "-t", f"{kf_end - kf_start:.3f}", "-i", video_path]
+        
+        movflags = VideoProcessingService._movflags()
+        for index, (_, _, _, output_path) in enumerate(copyable):
+            cmd += [
+                # The streams stream copy picks by default, from this range's input only
+                "-map", f"{index}:v:0",
+                "-map", f"{index}:a:0?",
+                "-c", "copy",
+                "-movflags", movflags,
+                "-avoid_negative_ts", "make_zero",
+                "-map_metadata", "-1",
+                "-y", output_path
+            ]
+        
+        logger.info(f"Creating {len(copyable)} clips from {video_path} in one stream copy")
+        returncode, error_msg = await VideoProcessingService._run_ffmpeg(cmd, f"batch of {len(copyable)}")
+        if returncode != 0:
+            logger.warning(f"Batch stream copy failed, clips fall back to one by one: {error_msg}")
+        
+        clip_paths: Dict[str, str] = {}
+        for clip_id, _, _, output_path in copyable:
+            output_stat = await FileManagerService.stat_async(output_path) if returncode == 0 else None
+            if output_stat is not None and output_stat.st_size > 1000:  # At least 1KB, as in create_clip
+                clip_paths[clip_id] = output_path
+            else:
+                await FileManagerService.cleanup_file(output_path)
+        return clip_paths
+    
+    @staticmethod
+    async def create_clip_stream(
+        video_path: str,
+        start_seconds: float,
+        end_seconds: float,
+        frame_accurate: bool = False,
+        keyframes: Optional[List[float]] = None
+    ) -> AsyncIterator[bytes]:
+        """
+        Cut a clip and yield it as fragmented MP4 while ffmpeg produces it, for
+        one-shot clips that don't need to be kept. Nothing touches disk, and a
+        streaming slot (STREAM_CONCURRENCY per web worker) is held until the
+        stream ends or the client goes away.
+        Unlike create_clip there is no copy-then-re-encode retry: once bytes are
+        sent the response can't be restarted.
+        """
+        duration = end_seconds - start_seconds
+        if duration <= 0:
+            raise InvalidTimeFormatException("End time must be after start time")
+        if duration > settings.max_video_duration:
+            raise InvalidTimeFormatException(f"Clip duration cannot exceed {settings.max_video_duration} seconds")
+        
+        keyframe_bounds = None
+        if not frame_accurate:
+            if keyframes is None:
+                keyframes = await VideoProcessingService._probe_keyframes(video_path, start_seconds, end_seconds) or []
+            keyframe_bounds = VideoProcessingService._keyframe_bounds(keyframes, start_seconds, end_seconds)
+        
+        # A pipe can't be seeked back to write the moov atom, so always fragment
+        pipe_output = ["-f", "mp4", "pipe:1"]
+        movflags = "frag_keyframe+empty_moov+default_base_moof"
+        if keyframe_bounds:
+            kf_start, kf_end = keyframe_bounds
+            cmd = VideoProcessingService._copy_command(video_path, kf_start, kf_end, movflags, pipe_output)
+        else:
+            encoder = await VideoProcessingService.get_encoder()
+            cmd = VideoProcessingService._encode_command(video_path, start_seconds, duration, encoder, movflags, pipe_output)
+        
+        async with _STREAM_SEM:
+            stream = stream_process(*cmd)
+            try:
+                async for chunk in stream:
+                    yield chunk
+            except subprocess.CalledProcessError as e:
+                logger.error(f"FFmpeg failed streaming clip from {video_path}: {e.stderr}")
+                raise VideoProcessingException(f"Failed to stream clip: {e.stderr}")
+            finally:
+                await stream.aclose()  # Kill ffmpeg now if the client went away
+    
+    @staticmethod
+    def _copy_command(
+        video_path: str,
+        kf_start: float,
+        kf_end: float,
+        movflags: str,
+        output_args: List[str]
+    ) -> List[str]:
+        """FFmpeg command stream-copying the keyframe-aligned range into output_args"""
+        return [
+            FFMPEG,
+            "-hide_banner", "-nostats", "-loglevel", "error",
+            # Seek before input for faster processing. Full precision: rounding the
+            # keyframe time down makes ffmpeg start from the previous keyframe
+            "-ss", f"{kf_start:.6f}",
+            "-i", video_path,
+            "-t", f"{kf_end - kf_start:.3f}",
+            "-c", "copy",
+            "-movflags", movflags,
+            "-avoid_negative_ts", "make_zero",
+            "-map_metadata", "-1",  # Remove metadata that might cause issues
+            *output_args
+        ]
+    
+    @staticmethod
+    def _encode_command(
+        video_path: str,
+        start_seconds: float,
+        duration: float,
+        encoder: str,
+        movflags: str,
+        output_args: List[str]
+    ) -> List[str]:
+        """FFmpeg command re-encoding the exact range into output_args"""
+        return [
+            FFMPEG,
+            "-hide_banner", "-nostats", "-loglevel", "error",
+            *VideoProcessingService._encoder_input_args(encoder),
+            # Input seek jumps to the keyframe before start; when transcoding ffmpeg
+            # then decodes and drops frames up to start (-accurate_seek is on by
+            # default), so this is already frame-accurate without an output -ss
+            "-ss", VideoProcessingService._seconds_to_time_format(start_seconds),
+            "-i", video_path,
+            "-t", str(duration),  # Timestamps restart at 0 after input seek, so -to would overshoot
+            
+            # Video encoding settings for maximum compatibility
+            *VideoProcessingService._encoder_output_args(encoder),
+            "-threads", str(settings.ffmpeg_threads),  # Leave cores for concurrent clips
+            
+            # Audio encoding
+            "-c:a", "aac",
+            "-b:a", "128k",
+            "-ar", "44100",  # Standard sample rate
+            
+            # Container and compatibility options
+            "-movflags", movflags,  # Web optimization
+            "-avoid_negative_ts", "make_zero",
+            "-map_metadata", "-1",  # Remove potentially problematic metadata
+            "-fflags", "+genpts",  # Generate timestamps
+            
+            *output_args
+        ]
+    
+    @staticmethod
+    async def _run_ffmpeg(cmd: List[str], clip_id: str) -> Tuple[int, str]:
+        """
+        Run an ffmpeg command once a concurrency slot is free and return
+        (returncode, last lines of stderr)
+        """
+        queued_at = time.monotonic()
+        async with _ENCODE_SEM:
+            waited = time.monotonic() - queued_at
+            if waited > 1:
+                logger.info(f"Clip {clip_id} waited {waited:.1f}s for an ffmpeg slot")
+            
+            returncode, _, stderr_tail = await run_process(*cmd)
+            return returncode, stderr_tail
+    
+    @staticmethod
+    async def get_encoder() -> str:
+        """Return the H.264 encoder to use, detecting hardware support once per process"""
+        global _selected_encoder
+        if _selected_encoder is None:
+            if settings.ffmpeg_encoder != "auto":
+                _selected_encoder = settings.ffmpeg_encoder
+            else:
+                _selected_encoder = await VideoProcessingService._detect_hardware_encoder() or "libx264"
+            logger.info(f"Using video encoder: {_selected_encoder}")
+        return _selected_encoder
+    
+    @staticmethod
+    async def _detect_hardware_encoder() -> Optional[str]:
+        """Return the first hardware encoder that is compiled in and actually initializes"""
+        returncode, stdout, _ = await run_process(FFMPEG, "-hide_banner", "-encoders", capture_stdout=True)
+        if returncode != 0:
+            return None
+        
+        available = stdout.decode('utf-8', errors='replace')
+        for encoder in HARDWARE_ENCODERS:
+            if f" {encoder} " not in available:
+                continue
+            
+            # Being compiled in doesn't mean the device is present, so encode one test frame
+            cmd = [
+                FFMPEG, "-hide_banner", "-nostats", "-loglevel", "error",
+                *VideoProcessingService._encoder_input_args(encoder),
+                "-f", "lavfi", "-i", "color=size=256x256:duration=0.1",
+                "-frames:v", "1",
+                *VideoProcessingService._encoder_output_args(encoder),
+                "-f", "null", "-"
+            ]
+            process = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.DEVNULL
+            )
+            if await process.wait() == 0:
+                return encoder
+        return None
+    
+    @staticmethod
+    def _movflags() -> str:
+        """MP4 muxer flags for the configured output mode"""
+        if settings.output_mode == "streaming":
+            # moov up front with no samples, media in self-contained fragments; no rewrite pass
+            return "frag_keyframe+empty_moov+default_base_moof"
+        return "+faststart"
+    
+    @staticmethod
+    def _encoder_input_args(encoder: str) -> List[str]:
+        """FFmpeg options that must precede -i for the given encoder"""
+        if encoder == "h264_vaapi":
+            return ["-vaapi_device", settings.vaapi_device]
+        return []
+    
+    @staticmethod
+    def _encoder_output_args(encoder: str) -> List[str]:
+        """FFmpeg video encoding options for the given encoder"""
+        if encoder == "h264_videotoolbox":
+            return [
+                "-c:v", "h264_videotoolbox",
+                "-profile:v", "high",
+                "-q:v", "65",  # Constant quality, 1-100 (higher is better)
+                "-pix_fmt", "yuv420p",
+            ]
+        if encoder == "h264_nvenc":
+            return [
+                "-c:v", "h264_nvenc",
+                "-preset", "p4",
+                "-tune", "hq",
+                "-profile:v", "high",
+                "-rc", "vbr",
+                "-cq", "23",
+                "-b:v", "0",
+                "-pix_fmt", "yuv420p",
+            ]
+        if encoder == "h264_vaapi":
+            return [
+                "-vf", "format=nv12,hwupload",
+                "-c:v", "h264_vaapi",
+                "-profile:v", "high",
+                "-qp", "23",
+            ]
+        if encoder == "h264_qsv":
+            return [
+                "-c:v", "h264_qsv",
+                "-preset", "medium",
+                "-profile:v", "high",
+                "-global_quality", "23",
+                "-pix_fmt", "nv12",
+            ]
+        return [
+            "-c:v", "libx264",
+            "-preset", settings.x264_preset,
+            "-tune", settings.x264_tune,
+            "-crf", "23",
+            "-pix_fmt", "yuv420p",  # No-op for typical sources, keeps odd ones playable
+        ]
+    
+    @staticmethod
+    async def _probe_keyframes(
+        video_path: str,
+        start_seconds: Optional[float] = None,
+        end_seconds: Optional[float] = None
+    ) -> Optional[List[float]]:
+        """
+        Return keyframe timestamps around the given range (or the whole file
+        when no range is given), or None if probing fails
+        """
+        cmd = [
+            FFPROBE,
+            "-v", "error",
+            "-select_streams", "v:0",
+            "-skip_frame", "nokey",  # Only keyframes are decoded
+            "-show_entries", "frame=best_effort_timestamp_time",
+            "-of", "csv=p=0"
+        ]
+        if start_seconds is not None and end_seconds is not None:
+            read_start = max(0.0, start_seconds - KEYFRAME_SEARCH_WINDOW)
+            read_end = end_seconds + KEYFRAME_SEARCH_WINDOW
+            cmd += ["-read_intervals", f"{read_start:.3f}%{read_end:.3f}"]
+        cmd.append(video_path)
+        
+        cache_key = await VideoProcessingService._probe_cache_key(("keyframes", start_seconds, end_seconds), video_path)
+        cached = VideoProcessingService._probe_cache_get(cache_key)
+        if cached is not None:
+            return list(cached)
+        
+        returncode, stdout, stderr_tail = await run_process(*cmd, capture_stdout=True)
+        
+        if returncode != 0:
+            logger.warning(f"Keyframe probe failed for {video_path}: {stderr_tail}")
+            return None
+        
+        keyframes = []
+        for line in stdout.decode().splitlines():
+            try:
+                keyframes.append(float(line.strip().rstrip(',')))
+            except ValueError:
+                continue  # N/A timestamps
+        keyframes.sort()
+        
+        VideoProcessingService._probe_cache_put(cache_key, list(keyframes))
+        return keyframes
+    
+    @staticmethod
+    async def _probe_cache_key(probe: Any, file_path: str) -> Optional[tuple]:
+        """Cache key identifying this exact file version, or None if it can't be stat'ed"""
+        stat_result = await FileManagerService.stat_async(file_path)
+        if stat_result is None:
+            return None
+        return (probe, file_path, stat_result.st_size, stat_result.st_mtime_ns)
+    
+    @staticmethod
+    def _probe_cache_get(key: Optional[tuple]) -> Any:
+        """Return a cached probe result and mark it recently used"""
+        if key is None or key not in _probe_cache:
+            return None
+        _probe_cache.move_to_end(key)
+        return _probe_cache[key]
+    
+    @staticmethod
+    def _probe_cache_put(key: Optional[tuple], value: Any) -> None:
+        """Store a probe result, evicting the least recently used beyond PROBE_CACHE_SIZE"""
+        if key is None:
+            return
+        _probe_cache[key] = value
+        _probe_cache.move_to_end(key)
+        while len(_probe_cache) > PROBE_CACHE_SIZE:
+            _probe_cache.popitem(last=False)
+    
+    @staticmethod
+    def _keyframe_bounds(keyframes: List[float], start_seconds: float, end_seconds: float) -> Optional[Tuple[float, float]]:
+        """
+        Widen (start, end) to the nearest keyframes. None if start isn't within
+        KEYFRAME_SNAP_TOLERANCE of a keyframe or the range spans fewer than two keyframes.
+        """
+        kf_start = max((kf for kf in keyframes if kf <= start_seconds), default=None)
+        if kf_start is None or start_seconds - kf_start > KEYFRAME_SNAP_TOLERANCE:
+            return None
+        
+        kf_end = min((kf for kf in keyframes if kf >= end_seconds), default=end_seconds)
+        spanned = sum(1 for kf in keyframes if kf_start <= kf <= kf_end)
+        if spanned < 2:
+            return None
+        
+        return kf_start, kf_end
+    
     @staticmethod
     async def _validate_output_file(file_path: str) -> None:
-        """Validate that the output file is a proper video file"""
+        """
+        Validate that the output file is a proper video file.
+        ffmpeg's exit code already vouches for the encode, so only sniff the MP4
+        atoms and fall back to a full ffprobe packet count when they look wrong.
+        """
+        if not await VideoProcessingService._looks_like_mp4(file_path):
+            logger.info(f"Atom check failed for {file_path}, probing packets")
+            await VideoProcessingService._probe_output_packets(file_path)
+    
+    @staticmethod
+    async def _looks_like_mp4(file_path: str) -> bool:
+        """Check for an ftyp atom at the start and a moov atom near either end"""
+        size = await FileManagerService.get_file_size(file_path)
+        if size <= 1024:
+            return False
+        
+        async with aiofiles.open(file_path, "rb") as f:
+            head = await f.read(MP4_SNIFF_BYTES)
+            if head[4:8] != b"ftyp":
+                return False
+            if b"moov" in head:
+                return True  # faststart or fragmented output
+            
+            await f.seek(max(0, size - MP4_SNIFF_BYTES))
+            tail = await f.read(MP4_SNIFF_BYTES)
+            return b"moov" in tail
+    
+    @staticmethod
+    async def _probe_output_packets(file_path: str) -> None:
+        """Validate the output by counting its video packets with ffprobe"""
         cmd = [
-            "ffprobe",
+            FFPROBE,
             "-v", "error",
             "-select_streams", "v:0",
             "-count_packets",
@@ -155,15 +560,10 @@ class VideoProcessingService:
             file_path
         ]
         
-        process = await asyncio.create_subprocess_exec(
-            *cmd,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        
-        stdout, stderr = await process.communicate()
+        returncode, stdout, stderr_tail = await run_process(*cmd, capture_stdout=True)
         
-        if process.returncode != 0:
+        if returncode != 0:
+            logger.warning(f"ffprobe failed for {file_path}: {stderr_tail}")
             raise VideoProcessingException("Generated file failed validation")
         
         try:
@@ -173,57 +573,38 @@ class VideoProcessingService:
         except ValueError:
             raise VideoProcessingException("Could not validate generated file")
     
-    @staticmethod
-    def _time_to_seconds(time_str: str) -> float:
-        """Convert time string to seconds"""
-        try:
-            parts = time_str.split(':')
-            if len(parts) == 2:  # MM:SS
-                minutes, seconds = parts
-                return int(minutes) * 60 + float(seconds)
-            elif len(parts) == 3:  # HH:MM:SS
-                hours, minutes, seconds = parts
-                return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
-            else:
-                raise ValueError("Invalid time format")
-        except (ValueError, IndexError) as e:
-            raise InvalidTimeFormatException(f"Invalid time format '{time_str}': {str(e)}")
-    
     @staticmethod
     def _seconds_to_time_format(seconds: float) -> str:
         """Convert seconds to HH:MM:SS.mmm format for FFmpeg"""
-        hours = int(seconds // 3600)
-        minutes = int((seconds % 3600) // 60)
-        secs = seconds % 60
-        return f"{hours:02d}:{minutes:02d}:{secs:06.3f}"
+        minutes, secs = divmod(round(seconds, 3), 60)  # Round first so 59.9996 can't print as "60.000"
+        hours, minutes = divmod(int(minutes), 60)
+        return "%02d:%02d:%06.3f" % (hours, minutes, secs)
     
     @staticmethod
     async def get_video_info(video_path: str) -> dict:
-        """Get video information using ffprobe"""
+        """Get video information using ffprobe, cached per file version"""
         try:
+            cache_key = await VideoProcessingService._probe_cache_key("info", video_path)
+            cached = VideoProcessingService._probe_cache_get(cache_key)
+            if cached is not None:
+                return dict(cached)
+            
             cmd = [
-                "ffprobe",
-                "-v", "quiet",
+                FFPROBE,
+                "-v", "error",  # Quiet on success, but keep the reason when probing fails
                 "-print_format", "json",
                 "-show_format",
                 "-show_streams",
                 video_path
             ]
             
-            process = await asyncio.create_subprocess_exec(
-                *cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
+            returncode, stdout, stderr_tail = await run_process(*cmd, capture_stdout=True)
             
-            stdout, stderr = await process.communicate()
-            
-            if process.returncode != 0:
-                error_msg = stderr.decode('utf-8') if stderr else "Unknown error"
+            if returncode != 0:
+                error_msg = stderr_tail or "Unknown error"
                 raise VideoProcessingException(f"Failed to get video info: {error_msg}")
             
-            import json
-            info = json.loads(stdout.decode('utf-8'))
+            info = orjson.loads(stdout)
             
             # Extract useful information
             video_stream = next((s for s in info['streams'] if s['codec_type'] == 'video'), None)
@@ -236,10 +617,12 @@ class VideoProcessingService:
             }
             
             if video_stream:
+                # r_frame_rate is a fraction like "30000/1001"; ffprobe reports "0/0" when unknown
+                num, _, den = video_stream.get('r_frame_rate', '0/1').partition('/')
                 result.update({
                     'width': int(video_stream.get('width', 0)),
                     'height': int(video_stream.get('height', 0)),
-                    'fps': eval(video_stream.get('r_frame_rate', '0/1')),
+                    'fps': int(num) / (int(den or 1) or 1),
                     'video_codec': video_stream.get('codec_name', 'unknown')
                 })
             
@@ -250,35 +633,23 @@ class VideoProcessingService:
                     'channels': int(audio_stream.get('channels', 0))
                 })
             
+            VideoProcessingService._probe_cache_put(cache_key, dict(result))
             return result
             
         except Exception as e:
             logger.error(f"Error getting video info: {str(e)}")
             raise VideoProcessingException(f"Failed to get video info: {str(e)}")
     
-    @staticmethod 
-    def validate_time_range(start_time: str, end_time: str, video_duration: float = None) -> bool:
-        """Validate that the time range is valid"""
+    @staticmethod
+    async def probe_video_metadata(video_path: str) -> Optional[Dict[str, Any]]:
+        """Probe duration, codec parameters and the full keyframe index of a downloaded video"""
         try:
-            start_seconds = VideoProcessingService._time_to_seconds(start_time)
-            end_seconds = VideoProcessingService._time_to_seconds(end_time)
-            
-            if start_seconds < 0 or end_seconds < 0:
-                raise InvalidTimeFormatException("Time values cannot be negative")
-            
-            if start_seconds >= end_seconds:
-                raise InvalidTimeFormatException("End time must be after start time")
-            
-            if video_duration and end_seconds > video_duration:
-                raise InvalidTimeFormatException(f"End time exceeds video duration ({video_duration}s)")
-            
-            duration = end_seconds - start_seconds
-            if duration > settings.max_video_duration:
-                raise InvalidTimeFormatException(f"Clip duration cannot exceed {settings.max_video_duration} seconds")
-            
-            return True
-            
+            metadata = await VideoProcessingService.get_video_info(video_path)
+            keyframes = await VideoProcessingService._probe_keyframes(video_path)
+            if keyframes:
+                # Left out on failure so clips re-probe instead of never stream copying
+                metadata['keyframes'] = keyframes
+            return metadata
         except Exception as e:
-            if isinstance(e, InvalidTimeFormatException):
-                raise
-            raise InvalidTimeFormatException(f"Invalid time range: {str(e)}")
\ No newline at end of file
+            logger.warning(f"Could not probe metadata for {video_path}: {str(e)}")
+            return None
@@ -1,66 +1,98 @@
 import asyncio
+import functools
 import subprocess
 import os
-import re
+import random
 from pathlib import Path
-from typing import Optional
+from typing import Any, Awaitable, Dict, List, Optional, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
+from sqlalchemy.orm import defer
 import logging
 
 from app.models.video import VideoDownload
+from app.core.youtube_url import parse_youtube_video_id
 from app.core.exceptions import VideoDownloadException, InvalidURLException
+from app.core.process import FFMPEG, YTDLP, run_process
+from app.services.file_manager import FileManagerService
+from app.services.video_processing import VideoProcessingService
 from app.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Downloads are network-bound, so they get their own limit separate from ffmpeg's
+_DOWNLOAD_SEM = asyncio.Semaphore(settings.download_concurrency)
+
+# video_id -> running download, so concurrent callers share one yt-dlp run
+_INFLIGHT: Dict[str, "asyncio.Future[str]"] = {}
+
+# Fallback retries on rate limiting: attempts per browser and backoff bounds (seconds)
+DOWNLOAD_RETRY_ATTEMPTS = 3
+DOWNLOAD_RETRY_BASE_DELAY = 2
+DOWNLOAD_RETRY_MAX_DELAY = 30
+
+# Markers of throttling in yt-dlp errors, the only failures worth retrying as-is
+_RATE_LIMIT_MARKERS = ("429", "too many requests", "rate limit", "rate-limit", "quota")
+
+# Per-video locks so concurrent jobs don't save the same video record twice.
+# Process-local; multiple worker processes can still race on a cold video.
+_download_locks: Dict[str, asyncio.Lock] = {}
+# Callers holding or waiting on each lock; it is dropped once the last one leaves
+_download_lock_users: Dict[str, int] = {}
+
 class YouTubeService:
     """Service for YouTube video operations"""
     
     @staticmethod
+    @functools.lru_cache(maxsize=1024)
     def extract_video_id(url: str) -> Optional[str]:
-        """Extract YouTube video ID from URL"""
-        patterns = [
-            r'(?:v=|\/)([0-9A-Za-z_-]{11}).*',
-            r'(?:embed\/)([0-9A-Za-z_-]{11})',
-            r'(?:v=)([0-9A-Za-z_-]{11})',
-            r'youtu\.be\/([0-9A-Za-z_-]{11})'
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, url)
-            if match:
-                return match.group(1)
+        """Extract YouTube video ID from URL, using the same parser as request validation"""
+        video_id = parse_youtube_video_id(url)
+        if video_id:
+            return video_id
         
         raise InvalidURLException(f"Could not extract video ID from URL: {url}")
     
     @staticmethod
-    async def get_video_record(db: AsyncSession, video_id: str) -> Optional[VideoDownload]:
-        """Get video record from database"""
+    async def get_video_record(db: AsyncSession, video_id: str, with_metadata: bool = False) -> Optional[VideoDownload]:
+        """
+        Get video record from database.
+        The metadata JSONB (keyframe index) is only fetched when with_metadata is set.
+        """
         try:
-            result = await db.execute(
-                select(VideoDownload).where(
-                    VideoDownload.video_id == video_id,
-                    VideoDownload.is_active == True
-                )
+            query = select(VideoDownload).where(
+                VideoDownload.video_id == video_id,
+                VideoDownload.is_active == True
             )
+            if not with_metadata:
+                query = query.options(defer(VideoDownload.video_metadata))
+            result = await db.execute(query)
             return result.scalar_one_or_none()
         except Exception as e:
             logger.error(f"Error fetching video record: {e}")
+            # A failed statement aborts the transaction, later queries on this session would fail too
+            await db.rollback()
             return None
     
     @staticmethod
-    async def save_video_record(db: AsyncSession, video_id: str, file_path: str, file_size: int = None) -> VideoDownload:
+    async def save_video_record(
+        db: AsyncSession,
+        video_id: str,
+        file_path: str,
+        file_size: int = None,
+        video_metadata: Optional[Dict[str, Any]] = None
+    ) -> VideoDownload:
         """Save video record to database"""
         try:
             video_record = VideoDownload(
                 video_id=video_id,
                 file_path=file_path,
-                file_size=file_size
+                file_size=file_size,
+                duration=int(video_metadata["duration"]) if video_metadata else None,
+                video_metadata=video_metadata
             )
             db.add(video_record)
-            await db.commit()
-            await db.refresh(video_record)
+            await db.flush()
             logger.info(f"Video record saved: {video_id}")
             return video_record
         except Exception as e:
@@ -68,15 +100,230 @@ class YouTubeService:
             logger.error(f"Error saving video record: {e}")
             raise
     
+    @staticmethod
+    async def ensure_video_downloaded(
+        db: AsyncSession,
+        video_id: str,
+        url: str,
+        video_path: Optional[str] = None
+    ) -> str:
+        """
+        Download and record the video unless it is already cached, and return its path.
+        Concurrent calls for the same video share a single download. A video_path
+        that was just downloaded is recorded instead of downloading again.
+        """
+        lock = _download_locks.setdefault(video_id, asyncio.Lock())
+        _download_lock_users[video_id] = _download_lock_users.get(video_id, 0) + 1
+        try:
+            async with lock:
+                return await YouTubeService._ensure_video_downloaded(db, video_id, url, video_path)
+        finally:
+            _download_lock_users[video_id] -= 1
+            if not _download_lock_users[video_id]:
+                del _download_lock_users[video_id]
+                del _download_locks[video_id]
+    
+    @staticmethod
+    async def _ensure_video_downloaded(
+        db: AsyncSession,
+        video_id: str,
+        url: str,
+        video_path: Optional[str] = None
+    ) -> str:
+        """Call with the video's lock held"""
+        # Re-check, another job may have finished the download while we waited
+        video_record = await YouTubeService.get_video_record(db, video_id)
+        
+        if not video_record:
+            logger.info(f"Video {video_id} not found in database, downloading...")
+            
+            # Download the video
+            video_path = video_path or await YouTubeService.download_video(video_id, url)
+            
+            # Get file size and probe keyframes/codec info once
+            file_size = await FileManagerService.get_file_size(video_path)
+            video_metadata = await VideoProcessingService.probe_video_metadata(video_path)
+            
+            # Save and commit now so jobs waiting on the lock see the record
+            await YouTubeService.save_video_record(db, video_id, video_path, file_size, video_metadata)
+            await db.commit()
+            logger.info(f"Video {video_id} downloaded and saved to database")
+            return video_path
+        
+        await db.refresh(video_record, ["file_path"])
+        if await FileManagerService.stat_async(video_record.file_path) is None:
+            logger.warning(f"Video file {video_record.file_path} missing, re-downloading...")
+            video_path = video_path or await YouTubeService.download_video(video_id, url)
+            file_size = await FileManagerService.get_file_size(video_path)
+            video_record.file_path = video_path
+            video_record.file_size = file_size
+            video_record.video_metadata = await VideoProcessingService.probe_video_metadata(video_path)
+            await db.commit()
+        
+        return video_record.file_path
+    
+    @staticmethod
+    async def ensure_videos_downloaded(db: AsyncSession, items: List[Tuple[str, str]]) -> Dict[str, str]:
+        """
+        Batch version of ensure_video_downloaded for (video_id, url) pairs.
+        Videos that aren't cached are fetched with one yt-dlp run, then each is
+        recorded under its lock as usual. Returns video_id -> path; videos that
+        failed to download are left out.
+        """
+        paths: Dict[str, str] = {}
+        cold = []
+        for video_id, url in items:
+            video_record = await YouTubeService.get_video_record(db, video_id)
+            if video_record and await FileManagerService.stat_async(video_record.file_path) is not None:
+                paths[video_id] = video_record.file_path
+            else:
+                cold.append((video_id, url))
+        
+        downloaded = await YouTubeService.download_batch(cold) if cold else {}
+        for video_id, url in cold:
+            if video_id in downloaded:
+                paths[video_id] = await YouTubeService.ensure_video_downloaded(
+                    db, video_id, url, downloaded[video_id]
+                )
+        
+        return paths
+    
     @staticmethod
     async def download_video(video_id: str, url: str) -> str:
+        """
+        Download video, waiting for a free download slot first.
+        Concurrent calls for the same video join the download already in
+        flight and get its result (or exception) instead of starting another.
+        """
+        download = _INFLIGHT.get(video_id)
+        if download is None:
+            download = YouTubeService._track_inflight(video_id, YouTubeService._download_limited(video_id, url))
+        else:
+            logger.info(f"Joining in-flight download for video ID: {video_id}")
+        
+        # Shielded so one caller going away doesn't cancel the download for the others
+        return await asyncio.shield(download)
+    
+    @staticmethod
+    def _track_inflight(video_id: str, download: Awaitable[str]) -> "asyncio.Future[str]":
+        """Start a download and register it in _INFLIGHT until it finishes"""
+        future = asyncio.ensure_future(download)
+        _INFLIGHT[video_id] = future
+        future.add_done_callback(lambda _: _INFLIGHT.pop(video_id, None))
+        return future
+    
+    @staticmethod
+    async def download_batch(items: List[Tuple[str, str]]) -> Dict[str, str]:
+        """
+        Download several videos with one yt-dlp process reading URLs from stdin,
+        so interpreter startup is paid once. Takes (video_id, url) pairs and
+        returns video_id -> path. Videos already downloading are joined as in
+        download_video, and each batched video is registered in _INFLIGHT so
+        single downloads join the batch too. Videos the batch run misses go
+        through the single-video path and its fallbacks; those that still fail
+        are left out.
+        """
+        downloads: Dict[str, "asyncio.Future[str]"] = {}
+        pending = []
+        for video_id, url in dict(items).items():
+            if video_id in _INFLIGHT:
+                logger.info(f"Joining in-flight download for video ID: {video_id}")
+                downloads[video_id] = _INFLIGHT[video_id]
+            else:
+                pending.append((video_id, url))
+        
+        if pending:
+            batch = asyncio.ensure_future(YouTubeService._download_batch_limited(pending))
+            for video_id, url in pending:
+                downloads[video_id] = YouTubeService._track_inflight(
+                    video_id, YouTubeService._download_from_batch(batch, video_id, url)
+                )
+        
+        results = await asyncio.gather(
+            *(asyncio.shield(download) for download in downloads.values()),
+            return_exceptions=True
+        )
+        
+        paths: Dict[str, str] = {}
+        for video_id, result in zip(downloads, results):
+            if isinstance(result, BaseException):
+                logger.error(f"Batch download of {video_id} failed: {str(result)}")
+            else:
+                paths[video_id] = result
+        
+        logger.info(f"Batch download finished: {len(paths)}/{len(downloads)} videos")
+        return paths
+    
+    @staticmethod
+    async def _download_from_batch(batch: "asyncio.Future[Dict[str, str]]", video_id: str, url: str) -> str:
+        """One video's share of a batch run, downloaded on its own if the run missed it"""
+        try:
+            paths = await asyncio.shield(batch)
+        except Exception as e:
+            logger.warning(f"Batch download run failed: {str(e)}")
+            paths = {}
+        
+        if video_id in paths:
+            return paths[video_id]
+        return await YouTubeService._download_limited(video_id, url)
+    
+    @staticmethod
+    async def _download_batch_limited(items: List[Tuple[str, str]]) -> Dict[str, str]:
+        # The whole batch is one yt-dlp process, so it takes one download slot
+        async with _DOWNLOAD_SEM:
+            return await YouTubeService._download_batch(items)
+    
+    @staticmethod
+    async def _download_batch(items: List[Tuple[str, str]]) -> Dict[str, str]:
+        """Run yt-dlp once over the batch and return video_id -> path of the videos it got"""
+        uploads_dir = Path(settings.uploads_dir)
+        cmd = [
+            YTDLP,
+            "-a", "-",  # Batch file on stdin
+            "-f", "bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best",
+            "-o", str(uploads_dir / "%(id)s.%(ext)s"),
+            "--merge-output-format", "mp4",
+            "--no-check-certificates",
+            "--cookies-from-browser", "chrome",
+            "--user-agent", "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+            "--referer", "https://www.youtube.com/",
+            "--add-header", "Accept-Language:en-US,en;q=0.9",
+            "--add-header", "Accept:text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
+            "--sleep-interval", "1",
+            "--max-sleep-interval", "3",
+            "--ignore-errors",  # One bad video shouldn't abort the rest
+            "--no-warnings",
+            "--print", "after_move:%(id)s %(filepath)s"  # Final path of each finished video
+        ]
+        urls = "".join(f"{url}\n" for _, url in items).encode()
+        
+        logger.info(f"Starting batch download of {len(items)} videos")
+        returncode, stdout, stderr_tail = await run_process(*cmd, capture_stdout=True, input=urls)
+        if returncode != 0:
+            logger.warning(f"Batch download finished with errors: {stderr_tail}")
+        
+        wanted = {video_id for video_id, _ in items}
+        paths: Dict[str, str] = {}
+        for line in stdout.decode('utf-8', errors='replace').splitlines():
+            video_id, _, file_path = line.partition(" ")
+            if video_id in wanted and file_path:
+                paths[video_id] = file_path
+        return paths
+    
+    @staticmethod
+    async def _download_limited(video_id: str, url: str) -> str:
+        async with _DOWNLOAD_SEM:
+            return await YouTubeService._download_video(video_id, url)
+    
+    @staticmethod
+    async def _download_video(video_id: str, url: str) -> str:
         """Download video using yt-dlp with bot detection workarounds"""
         uploads_dir = Path(settings.uploads_dir)
         output_path = uploads_dir / f"{video_id}.%(ext)s"
         
         # Base command with authentication and anti-bot measures
         cmd = [
-            "yt-dlp",
+            YTDLP,
             url,
             "-f", "bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best",
             "-o", str(output_path),
@@ -94,20 +341,18 @@ class YouTubeService:
         
         try:
             logger.info(f"Starting download for video ID: {video_id}")
-            process = await asyncio.create_subprocess_exec(
-                *cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            
-            stdout, stderr = await process.communicate()
+            returncode, _, stderr_tail = await run_process(*cmd)
             
-            if process.returncode != 0:
-                error_msg = stderr.decode('utf-8') if stderr else "Unknown error"
+            if returncode != 0:
+                error_msg = stderr_tail or "Unknown error"
                 logger.error(f"yt-dlp failed for {video_id}: {error_msg}")
                 
-                # Try fallback with Firefox cookies if Chrome fails
-                if "Sign in to confirm you're not a bot" in error_msg or "cookies" in error_msg.lower():
+                # Try fallback with Firefox cookies if Chrome fails or gets throttled
+                if (
+                    "Sign in to confirm you're not a bot" in error_msg
+                    or "cookies" in error_msg.lower()
+                    or YouTubeService._is_rate_limited(error_msg)
+                ):
                     logger.info(f"Retrying with Firefox cookies for video ID: {video_id}")
                     return await YouTubeService._download_with_fallback(video_id, url, uploads_dir, output_path)
                 
@@ -138,54 +383,60 @@ class YouTubeService:
         fallback_browsers = ["firefox", "edge", "safari"]
         
         for browser in fallback_browsers:
-            try:
-                logger.info(f"Trying fallback download with {browser} cookies for video ID: {video_id}")
-                
-                cmd = [
-                    "yt-dlp",
-                    url,
-                    "-f", "bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best",
-                    "-o", str(output_path),
-                    "--merge-output-format", "mp4",
-                    "--no-check-certificates",
-                    "--cookies-from-browser", browser,
-                    "--user-agent", "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-                    "--referer", "https://www.youtube.com/",
-                    "--sleep-interval", "2",
-                    "--max-sleep-interval", "5",
-                    "--no-warnings"
-                ]
-                
-                process = await asyncio.create_subprocess_exec(
-                    *cmd,
-                    stdout=asyncio.subprocess.PIPE,
-                    stderr=asyncio.subprocess.PIPE
-                )
-                
-                stdout, stderr = await process.communicate()
-                
-                if process.returncode == 0:
-                    # Find the downloaded file
-                    downloaded_file = uploads_dir / f"{video_id}.mp4"
-                    if not downloaded_file.exists():
-                        for file in uploads_dir.glob(f"{video_id}.*"):
-                            if file.suffix in ['.mp4', '.webm', '.mkv']:
-                                downloaded_file = file
-                                break
+            cmd = [
+                YTDLP,
+                url,
+                "-f", "bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best",
+                "-o", str(output_path),
+                "--merge-output-format", "mp4",
+                "--no-check-certificates",
+                "--cookies-from-browser", browser,
+                "--user-agent", "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+                "--referer", "https://www.youtube.com/",
+                "--sleep-interval", "2",
+                "--max-sleep-interval", "5",
+                "--no-warnings"
+            ]
+            
+            for attempt in range(DOWNLOAD_RETRY_ATTEMPTS):
+                try:
+                    logger.info(f"Trying fallback download with {browser} cookies for video ID: {video_id} (attempt {attempt + 1})")
+                    
+                    returncode, _, stderr_tail = await run_process(*cmd)
                     
-                    if downloaded_file.exists():
-                        logger.info(f"Video downloaded successfully with {browser} cookies: {downloaded_file}")
-                        return str(downloaded_file)
+                    if returncode == 0:
+                        # Find the downloaded file
+                        downloaded_file = uploads_dir / f"{video_id}.mp4"
+                        if not downloaded_file.exists():
+                            for file in uploads_dir.glob(f"{video_id}.*"):
+                                if file.suffix in ['.mp4', '.webm', '.mkv']:
+                                    downloaded_file = file
+                                    break
+                        
+                        if downloaded_file.exists():
+                            logger.info(f"Video downloaded successfully with {browser} cookies: {downloaded_file}")
+                            return str(downloaded_file)
+                        break
+                    
+                    logger.warning(f"Fallback with {browser} failed: {stderr_tail}")
+                    
+                except Exception as e:
+                    logger.warning(f"Fallback with {browser} failed: {str(e)}")
+                    break
+                
+                # Only throttling is worth retrying with the same browser
+                if not YouTubeService._is_rate_limited(stderr_tail) or attempt + 1 == DOWNLOAD_RETRY_ATTEMPTS:
+                    break
                 
-            except Exception as e:
-                logger.warning(f"Fallback with {browser} failed: {str(e)}")
-                continue
+                delay = YouTubeService._backoff_delay(attempt)
+                logger.info(f"Rate limited downloading {video_id}, retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
         
         # Final fallback without cookies
         logger.info(f"Trying final fallback without cookies for video ID: {video_id}")
         try:
             cmd = [
-                "yt-dlp",
+                YTDLP,
                 url,
                 "-f", "worst[ext=mp4]/worst",  # Use worst quality as last resort
                 "-o", str(output_path),
@@ -197,15 +448,9 @@ class YouTubeService:
                 "--no-warnings"
             ]
             
-            process = await asyncio.create_subprocess_exec(
-                *cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            
-            stdout, stderr = await process.communicate()
+            returncode, _, stderr_tail = await run_process(*cmd)
             
-            if process.returncode == 0:
+            if returncode == 0:
                 downloaded_file = uploads_dir / f"{video_id}.mp4"
                 if not downloaded_file.exists():
                     for file in uploads_dir.glob(f"{video_id}.*"):
@@ -216,18 +461,32 @@ class YouTubeService:
                 if downloaded_file.exists():
                     logger.info(f"Video downloaded successfully without cookies: {downloaded_file}")
                     return str(downloaded_file)
+            else:
+                logger.error(f"Final fallback failed: {stderr_tail}")
             
         except Exception as e:
             logger.error(f"Final fallback failed: {str(e)}")
         
         raise VideoDownloadException("All download methods failed. Please try again later or check if the video is publicly available.")
     
+    @staticmethod
+    def _is_rate_limited(error_msg: str) -> bool:
+        """Whether a yt-dlp error looks like throttling rather than a hard failure"""
+        error_msg = error_msg.lower()
+        return any(marker in error_msg for marker in _RATE_LIMIT_MARKERS)
+    
+    @staticmethod
+    def _backoff_delay(attempt: int) -> float:
+        """Exponential backoff with jitter for the given zero-based attempt"""
+        return min(DOWNLOAD_RETRY_MAX_DELAY, DOWNLOAD_RETRY_BASE_DELAY * 2 ** attempt) + random.uniform(0, 1)
+    
     @staticmethod
     async def create_clip(video_path: str, start_time: str, end_time: str, output_path: str) -> str:
         """Create a clip from downloaded video using ffmpeg"""
         try:
             cmd = [
-                "ffmpeg",
+                FFMPEG,
+                "-hide_banner", "-nostats", "-loglevel", "error",
                 "-i", video_path,
                 "-ss", start_time,
                 "-to", end_time,
@@ -238,16 +497,10 @@ class YouTubeService:
             ]
             
             logger.info(f"Creating clip: {start_time} to {end_time}")
-            process = await asyncio.create_subprocess_exec(
-                *cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            
-            stdout, stderr = await process.communicate()
+            returncode, _, stderr_tail = await run_process(*cmd)
             
-            if process.returncode != 0:
-                error_msg = stderr.decode('utf-8') if stderr else "Unknown error"
+            if returncode != 0:
+                error_msg = stderr_tail or "Unknown error"
                 logger.error(f"FFmpeg failed: {error_msg}")
                 raise VideoDownloadException(f"Failed to create clip: {error_msg}")
             
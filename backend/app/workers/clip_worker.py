@@ -0,0 +1,256 @@
+import asyncio
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import AsyncSessionLocal
+from app.core.exceptions import YouTubeClipperException
+from app.core.logging import setup_logging
+from app.core.queue import FETCH_QUEUE, RENDER_QUEUE, enqueue_render, redis_settings
+from app.models.video import VideoDownload
+from app.services.clip import ClipService
+from app.services.youtube import YouTubeService
+from app.services.video_processing import VideoProcessingService
+from app.services.file_manager import FileManagerService
+from app.services.storage import StorageService
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+async def _fail_clip(db: AsyncSession, clip_id: str, error: str) -> None:
+    """Discard the session's pending work and record the clip as failed"""
+    await _fail_clips(db, [clip_id], error)
+
+async def _fail_clips(db: AsyncSession, clip_ids: List[str], error: str) -> None:
+    """Discard the session's pending work and record the clips as failed"""
+    await db.rollback()
+    for clip_id in clip_ids:
+        await ClipService.mark_failed(db, clip_id, error)
+    await db.commit()
+
+async def fetch_video(
+    ctx: dict,
+    video_id: str,
+    url: str,
+    start_time: float,
+    end_time: float,
+    clip_id: str,
+    frame_accurate: bool = False
+) -> str:
+    """Download the source video of a queued clip, then queue the clip for rendering"""
+    async with AsyncSessionLocal() as db:
+        try:
+            await YouTubeService.ensure_video_downloaded(db, video_id, url)
+            await ctx["redis"].enqueue_job(
+                "render_clip",
+                video_id,
+                start_time,
+                end_time,
+                clip_id,
+                frame_accurate,
+                _job_id=clip_id,
+                _queue_name=RENDER_QUEUE
+            )
+        except YouTubeClipperException as e:
+            logger.error(f"Downloading video {video_id} for clip {clip_id} failed: {e.message}")
+            await _fail_clip(db, clip_id, e.message)
+            return "failed"
+        except asyncio.CancelledError:
+            # job_timeout or worker shutdown, don't leave the clip pending forever
+            logger.error(f"Downloading video {video_id} for clip {clip_id} was cancelled")
+            await _fail_clip(db, clip_id, "Download timed out or was cancelled")
+            raise
+        except Exception as e:
+            logger.error(f"Unexpected error downloading video {video_id}: {str(e)}")
+            await _fail_clip(db, clip_id, "An unexpected error occurred")
+            return "failed"
+
+    return "downloaded"
+
+async def fetch_videos(
+    ctx: dict,
+    videos: Dict[str, str],
+    clips: List[Tuple[str, str, float, float, bool]]
+) -> str:
+    """
+    Download the source videos of a queued clip batch with one yt-dlp run, then
+    queue the clips of each video for rendering together. Takes video_id -> url
+    and (clip_id, video_id, start_time, end_time, frame_accurate) clips.
+    """
+    clip_ids = [clip[0] for clip in clips]
+    async with AsyncSessionLocal() as db:
+        try:
+            paths = await YouTubeService.ensure_videos_downloaded(db, list(videos.items()))
+            video_clips: Dict[str, List[Tuple[str, float, float, bool]]] = {}
+            for clip_id, video_id, start_time, end_time, frame_accurate in clips:
+                if video_id not in paths:
+                    await ClipService.mark_failed(db, clip_id, "Failed to download video")
+                else:
+                    video_clips.setdefault(video_id, []).append((clip_id, start_time, end_time, frame_accurate))
+            
+            for video_id, render in video_clips.items():
+                await enqueue_render(ctx["redis"], video_id, render)
+            await db.commit()
+        except asyncio.CancelledError:
+            logger.error(f"Downloading videos for {len(clips)} clips was cancelled")
+            await _fail_clips(db, clip_ids, "Download timed out or was cancelled")
+            raise
+        except Exception as e:
+            logger.error(f"Unexpected error downloading videos {list(videos)}: {str(e)}")
+            await _fail_clips(db, clip_ids, "An unexpected error occurred")
+            return "failed"
+
+    logger.info(f"Downloaded {len(paths)}/{len(videos)} videos for {len(clips)} clips")
+    return "downloaded"
+
+async def _render(
+    db: AsyncSession,
+    video_record: VideoDownload,
+    keyframes: Optional[List[float]],
+    clip_id: str,
+    start_time: float,
+    end_time: float,
+    frame_accurate: bool,
+    clip_path: Optional[str] = None
+) -> str:
+    """Render a clip unless clip_path already holds it, store it and record the outcome"""
+    try:
+        if clip_path is None:
+            clip_path, _ = await VideoProcessingService.create_clip(
+                video_record.file_path,
+                start_time,
+                end_time,
+                clip_id=clip_id,
+                frame_accurate=frame_accurate,
+                keyframes=keyframes
+            )
+        clip_size = await FileManagerService.get_file_size(clip_path)
+        
+        if StorageService.is_enabled():
+            clip_path = await StorageService.upload_clip(clip_path, clip_id)
+    except YouTubeClipperException as e:
+        logger.error(f"Rendering clip {clip_id} failed: {e.message}")
+        await _fail_clip(db, clip_id, e.message)
+        return "failed"
+    except asyncio.CancelledError:
+        logger.error(f"Rendering clip {clip_id} was cancelled")
+        await _fail_clip(db, clip_id, "Rendering timed out or was cancelled")
+        raise
+    except Exception as e:
+        logger.error(f"Unexpected error rendering clip {clip_id}: {str(e)}")
+        await _fail_clip(db, clip_id, "An unexpected error occurred")
+        return "failed"
+
+    await ClipService.mark_done(db, clip_id, clip_path, clip_size)
+    await db.commit()
+    logger.info(f"Clip {clip_id} rendered")
+    return "done"
+
+async def render_clip(
+    ctx: dict,
+    video_id: str,
+    start_time: float,
+    end_time: float,
+    clip_id: str,
+    frame_accurate: bool = False
+) -> str:
+    """Render a queued clip and record the outcome on its clip row"""
+    async with AsyncSessionLocal() as db:
+        video_record = await YouTubeService.get_video_record(db, video_id, with_metadata=True)
+        if not video_record:
+            logger.error(f"Video {video_id} not found for clip {clip_id}")
+            await ClipService.mark_failed(db, clip_id, "Source video not found")
+            await db.commit()
+            return "failed"
+
+        # Rows saved before failed probes were left out hold [], re-probe those too
+        keyframes = (video_record.video_metadata or {}).get("keyframes") or None
+        return await _render(db, video_record, keyframes, clip_id, start_time, end_time, frame_accurate)
+
+async def render_clips(
+    ctx: dict,
+    video_id: str,
+    clips: List[Tuple[str, float, float, bool]]
+) -> str:
+    """
+    Render several queued (clip_id, start_time, end_time, frame_accurate) clips
+    of one video. Keyframe-aligned ranges are cut by a single ffmpeg run, the
+    rest and any that run didn't produce are rendered one by one.
+    """
+    unfinished = [clip[0] for clip in clips]
+    async with AsyncSessionLocal() as db:
+        video_record = await YouTubeService.get_video_record(db, video_id, with_metadata=True)
+        if not video_record:
+            logger.error(f"Video {video_id} not found for {len(clips)} clips")
+            await _fail_clips(db, unfinished, "Source video not found")
+            return "failed"
+
+        keyframes = (video_record.video_metadata or {}).get("keyframes") or None
+
+        try:
+            try:
+                clip_paths = await VideoProcessingService.create_clips_batch(
+                    video_record.file_path,
+                    [(clip_id, start_time, end_time) for clip_id, start_time, end_time, frame_accurate in clips
+                     if not frame_accurate],
+                    keyframes
+                )
+            except Exception as e:
+                logger.warning(f"Batch cut of video {video_id} failed, rendering clips one by one: {str(e)}")
+                clip_paths = {}
+
+            results = []
+            for clip_id, start_time, end_time, frame_accurate in clips:
+                results.append(await _render(
+                    db, video_record, keyframes, clip_id, start_time, end_time, frame_accurate, clip_paths.get(clip_id)
+                ))
+                unfinished.remove(clip_id)
+        except asyncio.CancelledError:
+            logger.error(f"Rendering clips of video {video_id} was cancelled")
+            await _fail_clips(db, unfinished, "Rendering timed out or was cancelled")
+            raise
+
+    logger.info(f"Rendered {results.count('done')}/{len(clips)} clips of video {video_id}")
+    return "done" if "failed" not in results else "failed"
+
+async def startup(ctx: dict) -> None:
+    """Render worker startup hook"""
+    ctx["log_listener"] = setup_logging()
+    ctx["log_listener"].start()
+    FileManagerService.ensure_directory(settings.uploads_dir)
+    await VideoProcessingService.get_encoder()
+    logger.info(f"Clip worker started (concurrency: {settings.clip_worker_concurrency})")
+
+async def fetch_startup(ctx: dict) -> None:
+    """Download worker startup hook"""
+    ctx["log_listener"] = setup_logging()
+    ctx["log_listener"].start()
+    FileManagerService.ensure_directory(settings.uploads_dir)
+    logger.info(f"Download worker started (concurrency: {settings.download_concurrency})")
+
+async def shutdown(ctx: dict) -> None:
+    """Worker shutdown hook"""
+    logger.info("Worker shutting down")
+    ctx["log_listener"].stop()
+
+class WorkerSettings:
+    """arq render worker configuration, run with `arq app.workers.clip_worker.WorkerSettings`"""
+    functions = [render_clip, render_clips]
+    on_startup = startup
+    on_shutdown = shutdown
+    redis_settings = redis_settings
+    queue_name = RENDER_QUEUE
+    max_jobs = settings.clip_worker_concurrency
+    job_timeout = 1800
+
+class FetchWorkerSettings:
+    """arq download worker configuration, run with `arq app.workers.clip_worker.FetchWorkerSettings`"""
+    functions = [fetch_video, fetch_videos]
+    on_startup = fetch_startup
+    on_shutdown = shutdown
+    redis_settings = redis_settings
+    queue_name = FETCH_QUEUE
+    # Matches _DOWNLOAD_SEM, so a fetch job never sits in a slot waiting on it
+    max_jobs = settings.download_concurrency
+    job_timeout = 1800
@@ -1,17 +1,23 @@
 
-import uvicorn
+import os
 from app.config import settings
 
 def run_prod():
     """Run production server"""
-    uvicorn.run(
+    # Gunicorn supervises and recycles the uvicorn workers; ServerWorker pins
+    # uvloop/httptools and applies WEB_WORKER_CONNECTIONS as the connection limit.
+    # Terminate HTTP/2 at the reverse proxy in front of this server.
+    # Every worker runs its own /clip/stream ffmpeg processes, up to
+    # STREAM_CONCURRENCY each; budget CPU for WEB_CONCURRENCY times that.
+    os.execvp("gunicorn", [
+        "gunicorn",
         "app.main:app",
-        host="0.0.0.0",
-        port=8000,
-        workers=4,
-        log_level="info",
-        access_log=False
-    )
+        "--workers", str(settings.web_concurrency),
+        "--worker-class", "app.core.server.ServerWorker",
+        "--preload",  # Import the app once in the master, workers fork from it
+        "--bind", "0.0.0.0:8000",
+        "--log-level", "info"
+    ])
 
 if __name__ == "__main__":
     run_prod()
@@ -0,0 +1,23 @@
+
+import multiprocessing
+import uvloop
+from arq import run_worker
+from app.workers.clip_worker import FetchWorkerSettings, WorkerSettings
+
+def _run(settings_cls) -> None:
+    uvloop.install()
+    run_worker(settings_cls)
+
+def run_clip_worker():
+    """Run background clip workers: renders here, downloads in a child process"""
+    fetcher = multiprocessing.Process(target=_run, args=(FetchWorkerSettings,), name="fetch-worker")
+    fetcher.start()
+    try:
+        _run(WorkerSettings)
+    finally:
+        # arq shuts the child down gracefully on SIGTERM as well
+        fetcher.terminate()
+        fetcher.join()
+
+if __name__ == "__main__":
+    run_clip_worker()
@@ -0,0 +1,27 @@
+import pytest
+
+from app.schemas.clip import _parse_time
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("0:00", 0),
+    ("1:30", 90),
+    ("01:30.25", 90.25),
+    ("90:00", 5400),
+    ("1:02:03", 3723),
+    ("01:02:03.500", 3723.5),
+])
+def test_parse_time(value, expected):
+    assert _parse_time(value) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("value", ["", "90", "1:5", "1:60", "1:60:00", "1:00:60", "abc", "1:2:3:4", "-1:00"])
+def test_parse_time_rejects_invalid(value):
+    with pytest.raises(ValueError):
+        _parse_time(value)
+
+
+@pytest.mark.parametrize("value", [90, 1.5, None])
+def test_parse_time_rejects_non_strings(value):
+    with pytest.raises(ValueError):
+        _parse_time(value)
@@ -0,0 +1,23 @@
+import asyncio
+
+from app.services.file_manager import FileManagerService
+
+
+def test_cleanup_file_removes_file(tmp_path):
+    clip = tmp_path / "clip.mp4"
+    clip.write_bytes(b"data")
+
+    assert asyncio.run(FileManagerService.cleanup_file(str(clip))) is True
+    assert not clip.exists()
+
+
+def test_cleanup_file_missing_file(tmp_path):
+    assert asyncio.run(FileManagerService.cleanup_file(str(tmp_path / "missing.mp4"))) is False
+
+
+def test_cleanup_file_other_error_is_not_raised(tmp_path):
+    directory = tmp_path / "clips"
+    directory.mkdir()
+
+    assert asyncio.run(FileManagerService.cleanup_file(str(directory))) is False
+    assert directory.exists()
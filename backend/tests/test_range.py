@@ -0,0 +1,39 @@
+import pytest
+
+from app.api.v1.endpoints.clip import _parse_range
+
+
+def test_parse_range_closed():
+    assert _parse_range("bytes=0-99", 1000) == (0, 99)
+
+
+def test_parse_range_end_clamped_to_file():
+    assert _parse_range("bytes=900-5000", 1000) == (900, 999)
+
+
+def test_parse_range_open_ended():
+    assert _parse_range("bytes=500-", 1000) == (500, 999)
+
+
+def test_parse_range_suffix():
+    assert _parse_range("bytes=-100", 1000) == (900, 999)
+
+
+def test_parse_range_suffix_longer_than_file():
+    assert _parse_range("bytes=-5000", 1000) == (0, 999)
+
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=1500-2000", "bytes=-0", "bytes=50-10"])
+def test_parse_range_unsatisfiable(header):
+    with pytest.raises(ValueError):
+        _parse_range(header, 1000)
+
+
+@pytest.mark.parametrize("header", ["bytes=0-1,5-10", "bytes=0-99, 200-299"])
+def test_parse_range_multi_range_ignored(header):
+    assert _parse_range(header, 1000) is None
+
+
+@pytest.mark.parametrize("header", ["items=0-99", "bytes=abc-", "bytes=0-xyz", "bytes=-"])
+def test_parse_range_malformed_ignored(header):
+    assert _parse_range(header, 1000) is None
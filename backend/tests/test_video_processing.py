@@ -0,0 +1,39 @@
+import pytest
+
+from app.services.video_processing import KEYFRAME_SNAP_TOLERANCE, VideoProcessingService
+
+KEYFRAMES = [0.0, 2.0, 4.0, 6.0, 8.0]
+
+
+def test_keyframe_bounds_widens_to_keyframes():
+    assert VideoProcessingService._keyframe_bounds(KEYFRAMES, 2.3, 5.0) == (2.0, 6.0)
+
+
+def test_keyframe_bounds_exact_keyframes():
+    assert VideoProcessingService._keyframe_bounds(KEYFRAMES, 2.0, 6.0) == (2.0, 6.0)
+
+
+def test_keyframe_bounds_start_at_tolerance():
+    start = 2.0 + KEYFRAME_SNAP_TOLERANCE
+    assert VideoProcessingService._keyframe_bounds(KEYFRAMES, start, 5.0) == (2.0, 6.0)
+
+
+def test_keyframe_bounds_start_past_tolerance():
+    start = 2.0 + KEYFRAME_SNAP_TOLERANCE + 0.1
+    assert VideoProcessingService._keyframe_bounds(KEYFRAMES, start, 5.0) is None
+
+
+def test_keyframe_bounds_start_before_first_keyframe():
+    assert VideoProcessingService._keyframe_bounds([1.0, 3.0, 5.0], 0.5, 4.0) is None
+
+
+def test_keyframe_bounds_end_after_last_keyframe():
+    assert VideoProcessingService._keyframe_bounds(KEYFRAMES, 6.2, 12.0) == (6.0, 12.0)
+
+
+def test_keyframe_bounds_needs_two_keyframes():
+    assert VideoProcessingService._keyframe_bounds([0.0], 0.1, 5.0) is None
+
+
+def test_keyframe_bounds_no_keyframes():
+    assert VideoProcessingService._keyframe_bounds([], 1.0, 2.0) is None
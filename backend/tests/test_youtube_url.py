@@ -0,0 +1,37 @@
+import pytest
+
+from app.core.youtube_url import parse_youtube_video_id
+
+VIDEO_ID = "dQw4w9WgXcQ"
+
+
+@pytest.mark.parametrize("url", [
+    f"https://www.youtube.com/watch?v={VIDEO_ID}",
+    f"https://youtube.com/watch?feature=share&v={VIDEO_ID}&t=42",
+    f"https://m.youtube.com/watch?v={VIDEO_ID}",
+    f"youtube.com/watch?v={VIDEO_ID}",
+    f"https://youtu.be/{VIDEO_ID}",
+    f"https://youtu.be/{VIDEO_ID}?t=10",
+    f"https://www.youtube.com/shorts/{VIDEO_ID}",
+    f"https://www.youtube.com/live/{VIDEO_ID}",
+    f"https://www.youtube.com/embed/{VIDEO_ID}",
+    f"https://www.youtube-nocookie.com/embed/{VIDEO_ID}",
+    f"https://www.youtube.com/v/{VIDEO_ID}/",
+    f"HTTPS://WWW.YOUTUBE.COM/watch?v={VIDEO_ID}",
+])
+def test_parse_youtube_video_id(url):
+    assert parse_youtube_video_id(url) == VIDEO_ID
+
+
+@pytest.mark.parametrize("url", [
+    "",
+    f"https://example.com/watch?v={VIDEO_ID}",
+    f"https://youtube.com.evil.com/watch?v={VIDEO_ID}",
+    "https://www.youtube.com/watch?v=tooshort",
+    f"https://www.youtube.com/watch?v={VIDEO_ID}x",
+    f"https://www.youtube.com/playlist?list={VIDEO_ID}",
+    "https://www.youtube.com/watch",
+    "https://youtu.be/",
+])
+def test_parse_youtube_video_id_rejects(url):
+    assert parse_youtube_video_id(url) is None
@@ -6,12 +6,49 @@ import { Input } from "@/components/ui/input";
 import { Button } from "@/components/ui/button";
 import { Loader2, Download, Scissors } from "lucide-react";
 
+const API_URL = "http://localhost:8000/api/v1/clip";
+const STATUS_POLL_INTERVAL = 2000;
+// Give up after the worker's job timeout, the clip can't still be rendering by then
+const STATUS_POLL_TIMEOUT = 30 * 60 * 1000;
+
+type ClipStatus = {
+  clip_id: string;
+  status: "pending" | "done" | "failed";
+  error: string | null;
+  download_url: string | null;
+};
+
+// Clips render in a background worker, so poll until the clip is done or failed
+async function waitForClip(clipId: string): Promise<ClipStatus> {
+  const deadline = Date.now() + STATUS_POLL_TIMEOUT;
+
+  while (Date.now() < deadline) {
+    const response = await fetch(`${API_URL}/status/${clipId}`);
+    const data = await response.json();
+
+    if (!response.ok) {
+      throw new Error(data.detail?.message || "Failed to get clip status");
+    }
+    if (data.status === "done") {
+      return data;
+    }
+    if (data.status === "failed") {
+      throw new Error(data.error || "Failed to create clip");
+    }
+
+    await new Promise((resolve) => setTimeout(resolve, STATUS_POLL_INTERVAL));
+  }
+
+  throw new Error("Timed out waiting for the clip");
+}
+
 export default function Home() {
   const [url, setUrl] = useState("");
   const [startTime, setStartTime] = useState("");
   const [endTime, setEndTime] = useState("");
   const [loading, setLoading] = useState(false);
   const [clipId, setClipId] = useState<string | null>(null);
+  const [downloadUrl, setDownloadUrl] = useState<string | null>(null);
   const [error, setError] = useState<string | null>(null);
 
   const handleSubmit = async (e: React.FormEvent) => {
@@ -19,9 +56,10 @@ export default function Home() {
     setLoading(true);
     setError(null);
     setClipId(null);
+    setDownloadUrl(null);
 
     try {
-      const response = await fetch("http://localhost:8000/api/v1/clip/", {
+      const response = await fetch(`${API_URL}/`, {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
@@ -39,7 +77,9 @@ export default function Home() {
         throw new Error(data.detail?.message || "Failed to create clip");
       }
 
-      setClipId(data.clip_id);
+      const clip = await waitForClip(data.clip_id);
+      setClipId(clip.clip_id);
+      setDownloadUrl(clip.download_url);
     } catch (err) {
       setError(err instanceof Error ? err.message : "Something went wrong");
     } finally {
@@ -49,7 +89,8 @@ export default function Home() {
 
   const handleDownload = () => {
     if (clipId) {
-      window.open(`http://localhost:8000/api/v1/clip/download/${clipId}`, "_blank");
+      // Object storage hands out a presigned URL; otherwise the API serves the file
+      window.open(downloadUrl ?? `${API_URL}/download/${clipId}`, "_blank");
     }
   };
 
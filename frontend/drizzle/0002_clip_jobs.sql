@@ -0,0 +1,16 @@
+CREATE TABLE IF NOT EXISTS "clips" (
+	"clip_id" varchar(36) PRIMARY KEY NOT NULL,
+	"video_id" varchar(20) NOT NULL,
+	"start_time" double precision NOT NULL,
+	"end_time" double precision NOT NULL,
+	"status" varchar(16) DEFAULT 'pending' NOT NULL,
+	"file_path" text,
+	"file_size" integer,
+	"error" text,
+	"created_at" timestamp with time zone DEFAULT now(),
+	"completed_at" timestamp with time zone
+);
+--> statement-breakpoint
+CREATE INDEX IF NOT EXISTS "ix_clips_clip_id" ON "clips" USING btree ("clip_id");--> statement-breakpoint
+CREATE INDEX IF NOT EXISTS "ix_clips_video_id" ON "clips" USING btree ("video_id");--> statement-breakpoint
+CREATE INDEX IF NOT EXISTS "ix_clips_status" ON "clips" USING btree ("status");
\ No newline at end of file
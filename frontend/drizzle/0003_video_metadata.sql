@@ -0,0 +1 @@
+ALTER TABLE "video_downloads" ADD COLUMN IF NOT EXISTS "metadata" jsonb;
\ No newline at end of file
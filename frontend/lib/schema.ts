@@ -1,4 +1,4 @@
-import { pgTable, text, timestamp, boolean, integer } from "drizzle-orm/pg-core";
+import { pgTable, text, timestamp, boolean, integer, jsonb, varchar, doublePrecision, index } from "drizzle-orm/pg-core";
 
 export const user = pgTable("user", {
 					id: text('id').primaryKey(),
@@ -51,6 +51,26 @@ export const videoDownload = pgTable("video_downloads", {
     filePath: text('file_path').notNull(),
     fileSize: integer('file_size'),
     duration: integer('duration'),
+    // Probe results (keyframe index) written by the backend
+    metadata: jsonb('metadata'),
     downloadedAt: timestamp('downloaded_at').notNull().defaultNow(),
     isActive: boolean('is_active').notNull().default(true)
 });
+
+// Owned by the backend clip worker, declared here so drizzle-kit push keeps it
+export const clip = pgTable("clips", {
+    clipId: varchar('clip_id', { length: 36 }).primaryKey(),
+    videoId: varchar('video_id', { length: 20 }).notNull(),
+    startTime: doublePrecision('start_time').notNull(),
+    endTime: doublePrecision('end_time').notNull(),
+    status: varchar('status', { length: 16 }).notNull().default('pending'),
+    filePath: text('file_path'),
+    fileSize: integer('file_size'),
+    error: text('error'),
+    createdAt: timestamp('created_at', { withTimezone: true }).defaultNow(),
+    completedAt: timestamp('completed_at', { withTimezone: true })
+}, (table) => [
+    index('ix_clips_clip_id').on(table.clipId),
+    index('ix_clips_video_id').on(table.videoId),
+    index('ix_clips_status').on(table.status)
+]);